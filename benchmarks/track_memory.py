@@ -0,0 +1,127 @@
+"""Measure the memory held per queued Track.
+
+Loads 10,000 YouTube tracks from persisted-queue JSON and reports the bytes
+retained per track, as measured by tracemalloc, for:
+
+* the original ``@dataclass`` Track (reproduced below for comparison),
+* the slotted Track,
+* the slotted Track with ``store_blobs_as_bytes`` enabled.
+
+Run from the repository root::
+
+    python benchmarks/track_memory.py [count]
+"""
+from __future__ import annotations
+
+import base64
+import gc
+import json
+import os
+import struct
+import sys
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from muse_music.models import Track  # noqa: E402
+
+
+@dataclass
+class DataclassTrack:
+    """The Track model as it was before it became slotted."""
+
+    title: str
+    uri: str
+    duration: int
+    requester_id: int
+    source: str
+    thumbnail: Optional[str] = None
+    lavalink_track: Optional[str] = None
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "DataclassTrack":
+        return cls(
+            title=payload.get("title", "Unknown Track"),
+            uri=payload.get("uri", ""),
+            duration=int(payload.get("duration", 0)),
+            requester_id=int(payload.get("requester_id", 0)),
+            source=payload.get("source", "unknown"),
+            thumbnail=payload.get("thumbnail"),
+            lavalink_track=payload.get("lavalink_track"),
+        )
+
+
+def _utf(text: str) -> bytes:
+    raw = text.encode("utf-8")
+    return struct.pack(">H", len(raw)) + raw
+
+
+def encode_track(title: str, author: str, length: int, identifier: str, uri: str) -> str:
+    """Encode a version 2 Lavaplayer track, the shape Lavalink hands out."""
+    body = (
+        struct.pack(">B", 2)
+        + _utf(title)
+        + _utf(author)
+        + struct.pack(">q", length)
+        + _utf(identifier)
+        + struct.pack(">?", False)
+        + struct.pack(">?", True)
+        + _utf(uri)
+        + _utf("youtube")
+        + struct.pack(">q", 0)
+    )
+    return base64.b64encode(struct.pack(">i", len(body) | (1 << 30)) + body).decode("ascii")
+
+
+def persisted_queue(count: int) -> str:
+    """A queue dump as ``GuildPlayer.persist`` would write it."""
+    entries = []
+    for i in range(count):
+        identifier = f"{i:011d}"[-11:]
+        title = f"Artist {i % 97} - Song number {i}"
+        uri = f"https://www.youtube.com/watch?v={identifier}"
+        entries.append(
+            {
+                "title": title,
+                "uri": uri,
+                "duration": 180_000 + i,
+                "requester_id": 100_000_000_000_000_000 + i % 50,
+                "source": "youtube",
+                "thumbnail": f"https://img.youtube.com/vi/{identifier}/hqdefault.jpg",
+                "lavalink_track": encode_track(title, f"Artist {i % 97}", 180_000 + i, identifier, uri),
+            }
+        )
+    return json.dumps(entries)
+
+
+def measure(dump: str, build: Callable[[Dict[str, Any]], Any]) -> int:
+    """Bytes still allocated once the tracks are built and the parsed JSON is dropped."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tracks: List[Any] = [build(payload) for payload in json.loads(dump)]
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del tracks
+    return retained
+
+
+def main(count: int = 10_000) -> None:
+    dump = persisted_queue(count)
+    variants = [
+        ("dataclass", DataclassTrack.from_dict, False),
+        ("slotted", Track.from_dict, False),
+        ("slotted + bytes", Track.from_dict, True),
+    ]
+    for label, build, as_bytes in variants:
+        Track.store_blobs_as_bytes = as_bytes
+        retained = measure(dump, build)
+        print(f"{label:<16} {retained / 1024:8.0f} KiB ({retained / count:.0f} B/track)")
+    Track.store_blobs_as_bytes = False
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
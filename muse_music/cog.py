@@ -1,17 +1,23 @@
 from __future__ import annotations
 
+import asyncio
 import logging
 from typing import Optional
 
 import discord
 from redbot.core import Config, commands
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
 
-from .embeds import now_playing_embed, queue_page_embed
+from .embeds import history_page_embed, now_playing_embed, queue_page_embed, queue_search_embed
 from .events import LavalinkEvents
-from .models import Track
-from .player import LoopMode, PlayerController
+from .failover import NodeFailover
+from .models import LoadResult
+from .nowplaying import NowPlayingManager
+from .player import GuildPlayer, LoopMode, PlayerController
+from .services.autocomplete import AutocompletePipeline
 from .services.autoplay import AutoplayService
+from .services.diskcache import DiskCache
 from .services.resolver import ResolverService
 
 log = logging.getLogger("red.muse_music")
@@ -28,23 +34,46 @@ class MuseMusic(commands.Cog):
         "max_queue_length": 200,
         "dj_role": None,
         "current": {},
+        "history": [],
     }
 
+    default_global = {
+        "queue_backend": "config",
+        "federated_search": False,
+    }
+
+    playlist_chunk_size = 50
+
     def __init__(self, bot: Red):
         self.bot = bot
         self.config = Config.get_conf(self, identifier=0xA11CE, force_registration=True)
         self.config.register_guild(**self.default_guild)
+        self.config.register_global(**self.default_global)
         self.resolver = ResolverService()
+        self.autocompleter = AutocompletePipeline(self.resolver)
         self.player_controller = PlayerController(bot, self.config)
         self.autoplay = AutoplayService(self.resolver)
-        self.events = LavalinkEvents(self.player_controller)
+        self.events = LavalinkEvents(self.player_controller, autoplay=self.autoplay)
+        self.now_playing = NowPlayingManager(self.player_controller)
+        self.failover = NodeFailover(self.player_controller)
 
     async def cog_load(self) -> None:
+        self.player_controller.journal_dir = cog_data_path(self) / "journals"
+        self.player_controller.use_journal = await self.config.queue_backend() == "journal"
+        self.resolver.federated = await self.config.federated_search()
+        self.resolver.disk = DiskCache(cog_data_path(self) / "resolver_cache.sqlite3")
+        await self.resolver.disk.open()
+        self.player_controller.start()
+        self.now_playing.start()
+        self.failover.start()
         await self.events.connect()
 
     async def cog_unload(self) -> None:
         await self.events.disconnect()
+        await self.failover.stop()
+        await self.now_playing.stop()
         await self.player_controller.teardown()
+        await self.resolver.close()
 
     async def interaction_check(self, interaction: discord.Interaction) -> bool:
         # enforce voice channel presence for slash invocations
@@ -60,24 +89,60 @@ class MuseMusic(commands.Cog):
             return None
         return channel
 
-    async def _resolve_track(self, ctx: commands.Context, query: str) -> Track:
+    async def _resolve_query(self, ctx: commands.Context, query: str) -> LoadResult:
+        if self.resolver._is_federated(query):
+            tracks = await self.resolver.search_text(query, ctx.author)
+            if not tracks:
+                raise commands.UserFeedbackCheckFailure("No results were found for that query.")
+            return LoadResult(tracks)
         prefix, adjusted = self.resolver._parse_prefix(query)
         search_query = query if query.startswith("http") else f"{prefix}{adjusted}"
-        tracks = await self.resolver.search(search_query, ctx.author)
-        if not tracks:
+        result = await self.resolver.load(search_query)
+        if not result.tracks:
             raise commands.UserFeedbackCheckFailure("No results were found for that query.")
-        return tracks[0]
+        return result
+
+    async def _enqueue_playlist(
+        self, ctx: commands.Context, channel: discord.VoiceChannel, player: GuildPlayer, result: LoadResult
+    ) -> None:
+        # queue the first entry and start it before streaming in the rest of the playlist
+        added = await player.enqueue_many([result.tracks[0].with_requester(ctx.author.id)])
+        if not player.current:
+            try:
+                await player.maybe_start_next(channel)
+            except commands.UserFeedbackCheckFailure as exc:
+                await ctx.send(str(exc))
+        total = len(result.tracks)
+        for start in range(1, total, self.playlist_chunk_size):
+            chunk = [t.with_requester(ctx.author.id) for t in result.tracks[start : start + self.playlist_chunk_size]]
+            try:
+                added_now = await player.enqueue_many(chunk)
+            except commands.UserFeedbackCheckFailure:
+                break
+            added += added_now
+            if added_now < len(chunk):
+                break
+            # yield between chunks so other guilds are not starved by a huge playlist
+            await asyncio.sleep(0)
+        message = f"Enqueued **{added}** tracks from **{result.playlist_name}**."
+        if added < total:
+            message += f" The queue is full, so {total - added} tracks were skipped."
+        await ctx.send(message)
 
     @commands.hybrid_command(name="play", description="Play a track or playlist using Lavalink.")
     async def play(self, ctx: commands.Context, *, query: str) -> None:
-        """Queue a new track from a query or URL."""
+        """Queue a new track or a whole playlist from a query or URL."""
         channel = await self._ensure_voice(ctx)
         if not channel:
             return
         async with ctx.typing():
             try:
-                track = await self._resolve_track(ctx, query)
+                result = await self._resolve_query(ctx, query)
                 player = await self.player_controller.get_player(ctx.guild)
+                if result.is_playlist:
+                    await self._enqueue_playlist(ctx, channel, player, result)
+                    return
+                track = result.tracks[0].with_requester(ctx.author.id)
                 await player.enqueue(track)
             except commands.UserFeedbackCheckFailure as exc:
                 await ctx.send(str(exc))
@@ -142,7 +207,7 @@ class MuseMusic(commands.Cog):
             return
         await ctx.send("Stopped playback and cleared the queue.")
 
-    @commands.hybrid_command(name="queue")
+    @commands.hybrid_group(name="queue", fallback="show", invoke_without_command=True)
     async def queue(self, ctx: commands.Context) -> None:
         channel = await self._ensure_voice(ctx)
         if not channel:
@@ -151,14 +216,69 @@ class MuseMusic(commands.Cog):
         embed = queue_page_embed(player, page=0)
         await ctx.send(embed=embed)
 
+    @queue.command(name="search")
+    async def queue_search(
+        self, ctx: commands.Context, member: Optional[discord.Member] = None, *, text: str = ""
+    ) -> None:
+        """Find queued tracks by title, optionally only those requested by `member`."""
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        if not text and member is None:
+            await ctx.send("Give a title to search for or a member to filter by.")
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        matches = player.find(text, requester_id=member.id if member else None)
+        await ctx.send(embed=queue_search_embed(text or member.display_name, matches))
+
+    @commands.hybrid_command(name="jump")
+    async def jump(self, ctx: commands.Context, *, target: str) -> None:
+        """Play a queued track now, by position or title."""
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        try:
+            track = await player.jump(channel, target)
+        except commands.UserFeedbackCheckFailure as exc:
+            await ctx.send(str(exc))
+            return
+        await ctx.send(f"Jumped to **{track.title}**.")
+
+    @commands.hybrid_command(name="history")
+    async def history(self, ctx: commands.Context, page: int = 1) -> None:
+        """Show recently played tracks, newest first."""
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        await ctx.send(embed=history_page_embed(player, page=max(page, 1) - 1))
+
+    @commands.hybrid_command(name="previous")
+    async def previous(self, ctx: commands.Context) -> None:
+        """Replay the last finished track; the current one goes back to the front of the queue."""
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        try:
+            track = await player.previous(channel)
+        except commands.UserFeedbackCheckFailure as exc:
+            await ctx.send(str(exc))
+            return
+        await ctx.send(f"Playing previous track **{track.title}**.")
+
     @commands.hybrid_command(name="nowplaying")
-    async def nowplaying(self, ctx: commands.Context) -> None:
+    async def nowplaying(self, ctx: commands.Context, live: bool = False) -> None:
+        """Show the current track; with `live` the message keeps updating."""
         channel = await self._ensure_voice(ctx)
         if not channel:
             return
         player = await self.player_controller.get_player(ctx.guild)
-        embed = now_playing_embed(player, position=0)
-        await ctx.send(embed=embed)
+        embed = now_playing_embed(player)
+        message = await ctx.send(embed=embed)
+        if live:
+            self.now_playing.attach(ctx.guild.id, message, player)
 
     @commands.hybrid_command(name="loop")
     async def loop(self, ctx: commands.Context, mode: Optional[str] = None) -> None:
@@ -175,18 +295,72 @@ class MuseMusic(commands.Cog):
         await ctx.send(f"Loop mode set to **{target_mode.value}**.")
 
     @commands.hybrid_command(name="remove")
-    async def remove(self, ctx: commands.Context, index: int) -> None:
+    async def remove(self, ctx: commands.Context, *, target: str) -> None:
+        """Remove a queued track by position or title."""
         channel = await self._ensure_voice(ctx)
         if not channel:
             return
         player = await self.player_controller.get_player(ctx.guild)
         try:
-            track = await player.remove(index)
+            track = await player.remove(target)
         except commands.UserFeedbackCheckFailure as exc:
             await ctx.send(str(exc))
             return
         await ctx.send(f"Removed **{track.title}** from the queue.")
 
+    @commands.hybrid_command(name="removerange")
+    async def removerange(self, ctx: commands.Context, start: int, end: int) -> None:
+        """Remove queue positions `start` through `end`."""
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        try:
+            removed = await player.remove_range(start, end)
+        except commands.UserFeedbackCheckFailure as exc:
+            await ctx.send(str(exc))
+            return
+        await ctx.send(f"Removed {removed} tracks from the queue.")
+
+    @commands.hybrid_command(name="removeuser")
+    async def removeuser(self, ctx: commands.Context, member: discord.Member) -> None:
+        """Remove every queued track requested by `member`."""
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        removed = await player.remove_requested_by({member.id})
+        await ctx.send(f"Removed {removed} tracks requested by {member.display_name}.")
+
+    @commands.hybrid_command(name="prune")
+    async def prune(self, ctx: commands.Context) -> None:
+        """Remove queued tracks requested by members who have left the voice channel."""
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        removed = await player.remove_absent({member.id for member in channel.members})
+        await ctx.send(f"Removed {removed} tracks from members no longer listening.")
+
+    @commands.hybrid_command(name="shuffle")
+    async def shuffle(self, ctx: commands.Context) -> None:
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        count = await player.shuffle()
+        await ctx.send(f"Shuffled {count} tracks.")
+
+    @commands.hybrid_command(name="dedupe")
+    async def dedupe(self, ctx: commands.Context) -> None:
+        """Remove duplicate tracks from the queue, keeping the earliest copy."""
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        removed = await player.dedupe()
+        await ctx.send(f"Removed {removed} duplicate tracks.")
+
     @commands.hybrid_command(name="move")
     async def move(self, ctx: commands.Context, start: int, end: int) -> None:
         channel = await self._ensure_voice(ctx)
@@ -231,9 +405,72 @@ class MuseMusic(commands.Cog):
         await config.default_volume.set(level)
         await ctx.send(f"Volume set to {level}.")
 
+    @commands.hybrid_command(name="autoplay")
+    async def autoplay_cmd(self, ctx: commands.Context, enabled: bool) -> None:
+        channel = await self._ensure_voice(ctx)
+        if not channel:
+            return
+        player = await self.player_controller.get_player(ctx.guild)
+        player.autoplay_enabled = enabled
+        await self.config.guild(ctx.guild).autoplay.set(enabled)
+        if not enabled:
+            self.autoplay.forget(ctx.guild.id)
+        elif player.current is not None and not player.queue:
+            self.autoplay.prefetch(ctx.guild.id, player.current)
+        await ctx.send(f"Autoplay is now **{'on' if enabled else 'off'}**.")
+
+    @commands.group(name="museset")
+    @commands.is_owner()
+    async def museset(self, ctx: commands.Context) -> None:
+        """Bot-wide settings for Muse music."""
+
+    @museset.command(name="backend")
+    async def museset_backend(self, ctx: commands.Context, backend: str) -> None:
+        """Store queues in Config (`config`) or an append-only journal on disk (`journal`)."""
+        backend = backend.lower()
+        if backend not in ("config", "journal"):
+            await ctx.send("Backend must be either `config` or `journal`.")
+            return
+        await self.config.queue_backend.set(backend)
+        await ctx.send(
+            f"Queue backend set to **{backend}**. Reload the cog to apply it; "
+            "each server's queue moves over the next time it is loaded."
+        )
+
+    @museset.command(name="federated")
+    async def museset_federated(self, ctx: commands.Context, enabled: bool) -> None:
+        """Search YouTube and SoundCloud together for queries without a `yt:`/`sc:` prefix."""
+        await self.config.federated_search.set(enabled)
+        self.resolver.federated = enabled
+        await ctx.send(f"Federated search is now **{'on' if enabled else 'off'}**.")
+
+    @museset.command(name="cachestats")
+    async def museset_cachestats(self, ctx: commands.Context) -> None:
+        """Show hit/miss/eviction counters for the search cache."""
+        stats = self.resolver.cache.stats()
+        await ctx.send("\n".join(f"**{name}**: {value}" for name, value in stats.items()))
+
+    @museset.command(name="events")
+    async def museset_events(self, ctx: commands.Context) -> None:
+        """Show Lavalink event queue depth and handler latency."""
+        stats = self.events.pipeline.stats()
+        await ctx.send("\n".join(f"**{name}**: {value}" for name, value in stats.items()))
+
+    @museset.command(name="players")
+    async def museset_players(self, ctx: commands.Context) -> None:
+        """Show how many guild players are resident in memory."""
+        stats = self.player_controller.stats()
+        await ctx.send("\n".join(f"**{name}**: {value}" for name, value in stats.items()))
+
+    @museset.command(name="nodes")
+    async def museset_nodes(self, ctx: commands.Context) -> None:
+        """Show Lavalink node health and the last failover."""
+        stats = self.failover.stats()
+        await ctx.send("\n".join(f"**{name}**: {value}" for name, value in stats.items()))
+
     @play.autocomplete("query")
     async def _play_autocomplete(self, interaction: discord.Interaction, current: str):
-        return await self.resolver.autocomplete(interaction, current)
+        return await self.autocompleter.complete(interaction, current)
 
 
 async def setup(bot: Red) -> None:
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import List, Optional, Tuple
+
 import discord
 from redbot.core.utils.chat_formatting import humanize_timedelta
 
@@ -7,7 +9,7 @@ from .models import Track
 from .player import GuildPlayer
 
 
-def now_playing_embed(player: GuildPlayer, position: int = 0) -> discord.Embed:
+def now_playing_embed(player: GuildPlayer, position: Optional[int] = None) -> discord.Embed:
     track = player.current
     embed = discord.Embed(title="Now Playing")
     if not track:
@@ -25,7 +27,7 @@ def now_playing_embed(player: GuildPlayer, position: int = 0) -> discord.Embed:
 
 
 def queue_page_embed(player: GuildPlayer, page: int = 0, per_page: int = 10) -> discord.Embed:
-    entries = list(player.queue)
+    entries = player.queue
     start = page * per_page
     end = start + per_page
     embed = discord.Embed(title="Queue")
@@ -40,10 +42,42 @@ def queue_page_embed(player: GuildPlayer, page: int = 0, per_page: int = 10) ->
         return embed
 
     lines = []
-    for idx, track in enumerate(entries[start:end], start=start + 1):
+    for idx, track in enumerate(entries.range(start, end), start=start + 1):
         duration = humanize_timedelta(seconds=track.duration / 1000)
         lines.append(f"`{idx}.` **{track.title}** • {duration} • <@{track.requester_id}>")
     embed.description = "\n".join(lines)
     total_pages = max(1, (len(entries) - 1) // per_page + 1)
     embed.set_footer(text=f"Page {page + 1}/{total_pages} • {len(entries)} tracks queued")
     return embed
+
+
+def history_page_embed(player: GuildPlayer, page: int = 0, per_page: int = 10) -> discord.Embed:
+    history = player.history
+    start = page * per_page
+    embed = discord.Embed(title="Recently Played")
+    if not history:
+        embed.description = "Nothing has been played yet."
+        return embed
+
+    lines = []
+    for idx, track in enumerate(history.recent(start, start + per_page), start=start + 1):
+        duration = humanize_timedelta(seconds=track.duration / 1000)
+        lines.append(f"`{idx}.` **{track.title}** • {duration} • <@{track.requester_id}>")
+    embed.description = "\n".join(lines) or "No tracks on this page."
+    total_pages = max(1, (len(history) - 1) // per_page + 1)
+    embed.set_footer(text=f"Page {page + 1}/{total_pages} • {len(history)} tracks remembered")
+    return embed
+
+
+def queue_search_embed(query: str, matches: List[Tuple[int, Track]]) -> discord.Embed:
+    embed = discord.Embed(title=f"Queue matches for “{query[:80]}”")
+    if not matches:
+        embed.description = "No queued track matches that search."
+        return embed
+
+    lines = []
+    for position, track in matches:
+        duration = humanize_timedelta(seconds=track.duration / 1000)
+        lines.append(f"`{position}.` **{track.title}** • {duration} • <@{track.requester_id}>")
+    embed.description = "\n".join(lines)
+    return embed
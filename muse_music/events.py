@@ -1,36 +1,115 @@
 from __future__ import annotations
 
 import logging
-from typing import Any
+from time import monotonic
+from typing import Any, Dict, Optional
 
 import discord
 from redbot.core import commands
 
-from .player import PlayerController, LoopMode
+from .pipeline import EventPipeline
+from .player import GuildPlayer, PlayerController, LoopMode
+from .services.autoplay import AutoplayService
 
 log = logging.getLogger("red.muse_music.events")
 
 
 class LavalinkEvents:
-    """Event bridge between Lavalink and guild players."""
+    """Event bridge between Lavalink and guild players.
 
-    def __init__(self, controller: PlayerController):
+    The Lavalink hooks only enqueue; handlers run on the event pipeline so a slow
+    guild never holds up another guild's events.
+    """
+
+    def __init__(
+        self,
+        controller: PlayerController,
+        pipeline: Optional[EventPipeline] = None,
+        autoplay: Optional[AutoplayService] = None,
+    ):
         self.controller = controller
+        self.autoplay = autoplay
+        self.pipeline = pipeline or EventPipeline()
+        self._ended_at: Dict[int, float] = {}
+        # most recent TrackEnd -> TrackStart gap per guild, in milliseconds
+        self.gaps: Dict[int, float] = {}
+
+    @staticmethod
+    def _guild_id(event: Any) -> Optional[int]:
+        try:
+            return event.player.guild_id if hasattr(event, "player") else event.guild_id
+        except Exception:
+            return getattr(event, "guild_id", None)
+
+    @staticmethod
+    def _reason_name(reason: Any) -> str:
+        # Lavalink v3 sends "FINISHED", v4 "finished"; client libraries may wrap it in an enum
+        return str(getattr(reason, "value", reason)).upper()
+
+    def dispatch(self, kind: str, event: Any) -> None:
+        """Queue ``event`` for the handler named ``kind`` and return immediately."""
+        guild = self._guild_id(event)
+        if guild is None:
+            return
+        if kind == "player_update":
+            # stamp arrival on the bot's own clock; the update may wait in the queue a while
+            self.pipeline.submit(guild, kind, self.player_update, event, monotonic())
+            return
+        self.pipeline.submit(guild, kind, getattr(self, kind), event)
+
+    async def _on_track_start(self, event: Any) -> None:
+        self.dispatch("track_start", event)
+
+    async def _on_track_end(self, event: Any) -> None:
+        self.dispatch("track_end", event)
+
+    async def _on_player_update(self, event: Any) -> None:
+        self.dispatch("player_update", event)
 
     async def track_start(self, event: Any) -> None:
-        log.info("Track started in guild %s", event.guild_id)
+        guild = self._guild_id(event)
+        log.info("Track started in guild %s", guild)
+        ended_at = self._ended_at.pop(guild, None)
+        if ended_at is not None:
+            gap = (monotonic() - ended_at) * 1000
+            self.gaps[guild] = gap
+            log.debug("TrackEnd -> TrackStart gap in guild %s: %.1f ms", guild, gap)
+        player = self.controller.players.get(guild)
+        if player is not None:
+            # note what follows, so autoplay knows when the last queued track is playing
+            player.prepare_next()
+            self._autoplay_prefetch(player)
+
+    def _autoplay_prefetch(self, player: GuildPlayer) -> None:
+        if self.autoplay is None or player.current is None:
+            return
+        self.autoplay.remember(player.guild_id, player.current)
+        if player.autoplay_enabled and player.prepared is None:
+            # this is the last queued track: find what comes after it while it plays
+            self.autoplay.prefetch(player.guild_id, player.current)
 
     async def track_end(self, event: Any) -> None:
-        try:
-            guild = event.player.guild_id if hasattr(event, "player") else event.guild_id
-        except Exception:
-            guild = getattr(event, "guild_id", None)
+        guild = self._guild_id(event)
         if guild is None:
             return
+        reason = getattr(event, "reason", "")
+        if self._reason_name(reason) == "REPLACED":
+            # a command such as /previous started another track; it owns what plays next
+            return
+        self._ended_at[guild] = monotonic()
         try:
             player = await self.controller.get_player(discord.Object(id=guild))
-            next_track = await player.on_track_end(getattr(event, "reason", ""))
+            finished = player.current
+            next_track = await player.on_track_end(reason)
+            if not next_track and finished is not None and self._should_autoplay(player, reason):
+                picked = await self.autoplay.maybe_autoplay(  # type: ignore[union-attr]
+                    guild, last_track=finished, requester_id=finished.requester_id
+                )
+                # a /play during the search saw the finished track as current and only queued;
+                # what a user queued goes ahead of the related pick
+                next_track = await player.take_next() or picked
             if not next_track:
+                self._ended_at.pop(guild, None)
                 await player.stop()
                 return
             # attempt to resume playback in the same channel
@@ -44,20 +123,33 @@ class LavalinkEvents:
         except Exception:
             log.exception("Error handling track end for guild %s", guild)
 
-    async def player_update(self, event: Any) -> None:
-        # Placeholder for progress tracking in the future
-        return
+    def _should_autoplay(self, player: GuildPlayer, reason: Any) -> bool:
+        # a skip to an empty queue or /stop should not pull in a related track
+        return (
+            self.autoplay is not None
+            and player.autoplay_enabled
+            and self._reason_name(reason) in ("FINISHED", "LOAD_FAILED")
+        )
+
+    async def player_update(self, event: Any, received_at: Optional[float] = None) -> None:
+        guild = self._guild_id(event)
+        player = self.controller.players.get(guild)
+        position = getattr(event, "position", None)
+        if player is None or player.current is None or position is None:
+            return
+        player.position.update(int(position), received_at)
 
     async def connect(self) -> None:
+        self.pipeline.start()
         try:
             from redbot.cogs.audio import lavalink
         except ImportError:
             log.warning("Lavalink is not available; event handlers not attached.")
             return
         lavalink.add_event_hooks(
-            self.track_start,
-            self.track_end,
-            self.player_update,
+            self._on_track_start,
+            self._on_track_end,
+            self._on_player_update,
         )
         log.info("Muse music Lavalink listeners registered.")
 
@@ -65,9 +157,11 @@ class LavalinkEvents:
         try:
             from redbot.cogs.audio import lavalink
         except ImportError:
-            return
-        lavalink.remove_event_hooks(
-            self.track_start,
-            self.track_end,
-            self.player_update,
-        )
+            lavalink = None
+        if lavalink is not None:
+            lavalink.remove_event_hooks(
+                self._on_track_start,
+                self._on_track_end,
+                self._on_player_update,
+            )
+        await self.pipeline.stop()
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from time import monotonic
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from .player import GuildPlayer, PlayerController
+from .services.nodes import node_key, node_ready
+
+log = logging.getLogger("red.muse_music.failover")
+
+
+class NodeFailover:
+    """Moves playing guilds off a Lavalink node that went down.
+
+    Red's Lavalink client only reconnects a node to itself, so when one drops
+    its guilds fall silent until it comes back. Node readiness is checked every
+    ``interval`` seconds; when a node stops being ready, every guild playing on
+    it is disconnected from it and its current track is replayed on a ready
+    node at the tracked position, with at most ``concurrency`` guilds moving at
+    once. The time to recover is logged and kept in ``last_failover``.
+    """
+
+    def __init__(
+        self,
+        controller: PlayerController,
+        *,
+        interval: float = 2.0,
+        concurrency: int = 5,
+        node_provider: Optional[Callable[[], Sequence[Any]]] = None,
+    ):
+        self.controller = controller
+        self.interval = interval
+        self.concurrency = concurrency
+        self.node_provider = node_provider
+        self._ready: Dict[str, bool] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.failovers = 0
+        self.moved = 0
+        self.failed = 0
+        self.last_failover: Dict[str, Any] = {}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._ready.clear()
+
+    def _nodes(self) -> Sequence[Any]:
+        if self.node_provider is not None:
+            return self.node_provider()
+        try:
+            from redbot.cogs.audio import lavalink
+        except ImportError:
+            return []
+        get_all_nodes = getattr(lavalink, "get_all_nodes", None)
+        return get_all_nodes() if get_all_nodes is not None else []
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.check()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Lavalink node health check failed")
+            await asyncio.sleep(self.interval)
+
+    async def check(self) -> None:
+        """Fail over every node that was ready on the last check and no longer is."""
+        nodes = self._nodes()
+        down = []
+        for node in nodes:
+            key = node_key(node)
+            ready = node_ready(node)
+            if self._ready.get(key) and not ready:
+                down.append(node)
+            self._ready[key] = ready
+        for node in down:
+            await self.fail_over(node, nodes)
+
+    async def fail_over(self, node: Any, nodes: Sequence[Any]) -> int:
+        """Replay the guilds playing on ``node`` on the surviving nodes; returns how many moved."""
+        key = node_key(node)
+        started = monotonic()
+        moves = self._moves(node)
+        if not moves:
+            return 0
+        if not any(node_ready(other) for other in nodes if other is not node):
+            log.warning("Lavalink node %s went down with %s players and no other node is ready", key, len(moves))
+            return 0
+        self.failovers += 1
+        limit = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._migrate(limit, player, old) for player, old in moves))
+        moved = sum(results)
+        elapsed = monotonic() - started
+        self.moved += moved
+        self.failed += len(results) - moved
+        self.last_failover = {
+            "node": key,
+            "players": len(results),
+            "moved": moved,
+            "seconds": round(elapsed, 2),
+        }
+        log.warning(
+            "Lavalink node %s went down; resumed %s of %s players in %.2fs", key, moved, len(results), elapsed
+        )
+        return moved
+
+    def _moves(self, node: Any) -> List[Any]:
+        moves = []
+        for guild_id in list(getattr(node, "guild_ids", ())):
+            player = self.controller.players.get(guild_id)
+            # guilds with nothing playing reconnect on their next /play
+            if player is None or player.current is None:
+                continue
+            try:
+                old = node.get_player(guild_id)
+            except Exception:
+                continue
+            moves.append((player, old))
+        return moves
+
+    async def _migrate(self, limit: asyncio.Semaphore, player: GuildPlayer, old: Any) -> bool:
+        async with limit:
+            try:
+                return await player.migrate(old)
+            except Exception:
+                log.exception("Failed to move guild %s to another Lavalink node", player.guild_id)
+                return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "nodes": len(self._ready),
+            "ready": sum(self._ready.values()),
+            "failovers": self.failovers,
+            "moved": self.moved,
+            "failed": self.failed,
+            **{f"last_{name}": value for name, value in self.last_failover.items()},
+        }
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+from .models import Track
+
+log = logging.getLogger("red.muse_music.journal")
+
+
+def apply_op(queue: List[Dict[str, Any]], op: List[Any]) -> None:
+    """Apply a single journal operation to a list of serialized tracks."""
+    kind = op[0]
+    if kind == "enqueue":
+        queue.append(op[1])
+    elif kind == "extend":
+        queue.extend(op[1])
+    elif kind == "insert":
+        queue.insert(op[1], op[2])
+    elif kind == "remove":
+        del queue[op[1]]
+    elif kind == "move":
+        queue.insert(op[2], queue.pop(op[1]))
+    elif kind == "pop":
+        if queue:
+            queue.pop(0)
+    elif kind == "clear":
+        queue.clear()
+    else:
+        raise ValueError(f"Unknown journal operation {kind!r}")
+
+
+class QueueJournal:
+    """Append-only log of queue operations for one guild, compacted into snapshots."""
+
+    def __init__(self, directory: Path, guild_id: int, *, compact_after: int = 500):
+        self.directory = directory
+        self.log_path = directory / f"{guild_id}.log"
+        self.snapshot_path = directory / f"{guild_id}.snapshot.json"
+        self.compact_after = compact_after
+        self.entries = 0
+        self.generation = 0
+        self._handle: Optional[TextIO] = None
+
+    @property
+    def needs_compaction(self) -> bool:
+        return self.entries >= self.compact_after
+
+    def replay(self) -> Optional[List[Dict[str, Any]]]:
+        """Rebuild the queue from snapshot + log, or return None if nothing is on disk."""
+        if not self.snapshot_path.exists() and not self.log_path.exists():
+            return None
+        queue: List[Dict[str, Any]] = []
+        if self.snapshot_path.exists():
+            with self.snapshot_path.open("r", encoding="utf-8") as fp:
+                snapshot = json.load(fp)
+            self.generation = snapshot["generation"]
+            queue = snapshot["queue"]
+        self.entries = 0
+        if self.log_path.exists():
+            with self.log_path.open("r", encoding="utf-8") as fp:
+                header = fp.readline()
+                if not header or json.loads(header) != ["generation", self.generation]:
+                    # the log predates the snapshot (crash mid-compaction) and is already folded in
+                    return queue
+                for line in fp:
+                    try:
+                        apply_op(queue, json.loads(line))
+                    except (ValueError, IndexError):
+                        # a torn trailing write from a crash; everything before it is intact
+                        log.warning("Stopped replaying %s at a corrupt entry", self.log_path)
+                        break
+                    self.entries += 1
+        return queue
+
+    def append(self, op: str, *args: Any) -> None:
+        if self._handle is None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            fresh = not self.log_path.exists() or self.log_path.stat().st_size == 0
+            self._handle = self.log_path.open("a", encoding="utf-8")
+            if fresh:
+                self._write_line(["generation", self.generation])
+        self._write_line([op, *args])
+        self.entries += 1
+
+    def _write_line(self, entry: List[Any]) -> None:
+        assert self._handle is not None
+        self._handle.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._handle.flush()
+
+    def compact(self, queue: Iterable[Track]) -> None:
+        """Write the current queue as a snapshot and truncate the log."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        generation = self.generation + 1
+        snapshot = {"generation": generation, "queue": [track.to_dict() for track in queue]}
+        tmp_path = self.snapshot_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as fp:
+            json.dump(snapshot, fp, separators=(",", ":"))
+        os.replace(tmp_path, self.snapshot_path)
+        self.generation = generation
+        self.close()
+        self.log_path.unlink(missing_ok=True)
+        self.entries = 0
+
+    def discard(self) -> None:
+        """Delete the snapshot and log, e.g. once the queue has moved to Config."""
+        self.close()
+        self.log_path.unlink(missing_ok=True)
+        self.snapshot_path.unlink(missing_ok=True)
+        self.entries = 0
+        self.generation = 0
+
+    def close(self) -> None:
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
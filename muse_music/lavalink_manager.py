@@ -83,12 +83,13 @@ class LavalinkManager:
         try:
             import lavalink as _lv
 
+            # playback events are queued per guild rather than handled inside the client's hook
             if isinstance(event, _lv.events.TrackStartEvent):
-                await self._event_bridge.track_start(event)
+                self._event_bridge.dispatch("track_start", event)
             elif isinstance(event, _lv.events.TrackEndEvent):
-                await self._event_bridge.track_end(event)
+                self._event_bridge.dispatch("track_end", event)
             elif isinstance(event, _lv.events.PlayerUpdateEvent):
-                await self._event_bridge.player_update(event)
+                self._event_bridge.dispatch("player_update", event)
         except Exception:
             log.exception("Error dispatching Lavalink event")
 
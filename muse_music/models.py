@@ -1,20 +1,151 @@
 from __future__ import annotations
 
+import base64
+import binascii
+import struct
+import sys
 from dataclasses import dataclass
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
+
+
+class _TrackReader:
+    """Reads the Java DataInput primitives used by Lavaplayer's track encoding."""
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.pos = 0
+
+    def read(self, fmt: str) -> Any:
+        (value,) = struct.unpack_from(fmt, self.data, self.pos)
+        self.pos += struct.calcsize(fmt)
+        return value
+
+    def read_utf(self) -> str:
+        length = self.read(">H")
+        raw = self.data[self.pos : self.pos + length]
+        if len(raw) != length:
+            raise ValueError("Truncated string in encoded track")
+        self.pos += length
+        try:
+            return raw.decode("utf-8")
+        except UnicodeDecodeError:
+            # Java's modified UTF-8: encoded NULs and CESU-8 surrogate pairs
+            text = raw.replace(b"\xc0\x80", b"\x00").decode("utf-8", "surrogatepass")
+            return text.encode("utf-16", "surrogatepass").decode("utf-16")
+
+    def read_nullable_utf(self) -> Optional[str]:
+        return self.read_utf() if self.read(">?") else None
+
+
+def decode_lavalink_track(encoded: str) -> Dict[str, Any]:
+    """Decode a base64 Lavalink track into its ``info`` mapping without calling /decodetracks."""
+    try:
+        reader = _TrackReader(base64.b64decode(encoded))
+        header = reader.read(">i")
+        version = reader.read(">B") if (header >> 30) & 1 else 1
+        info: Dict[str, Any] = {
+            "title": reader.read_utf(),
+            "author": reader.read_utf(),
+            "length": reader.read(">q"),
+            "identifier": reader.read_utf(),
+            "isStream": reader.read(">?"),
+            "uri": reader.read_nullable_utf() if version >= 2 else None,
+            "artworkUrl": None,
+            "isrc": None,
+        }
+        if version >= 3:
+            info["artworkUrl"] = reader.read_nullable_utf()
+            info["isrc"] = reader.read_nullable_utf()
+        info["sourceName"] = reader.read_utf()
+    except (binascii.Error, struct.error) as exc:
+        raise ValueError("Malformed Lavalink track") from exc
+    return info
 
 
-@dataclass
 class Track:
-    """Lightweight track model mirroring Muse semantics."""
+    """Lightweight track model mirroring Muse semantics.
+
+    Tracks are slotted because every queued entry in every guild is one of these.
+    ``source`` is interned, YouTube thumbnails are derived from the URI instead of
+    stored, and the encoded Lavalink track can optionally be kept as raw bytes.
+    """
+
+    __slots__ = ("title", "uri", "duration", "requester_id", "source", "_thumbnail", "_blob")
+
+    # keep encoded tracks as decoded bytes (~25% smaller) at the cost of re-encoding on access
+    store_blobs_as_bytes = False
+
+    def __init__(
+        self,
+        title: str,
+        uri: str,
+        duration: int,
+        requester_id: int,
+        source: str,
+        thumbnail: Optional[str] = None,
+        lavalink_track: Optional[str] = None,
+    ):
+        self.title = title
+        self.uri = uri
+        self.duration = duration
+        self.requester_id = requester_id
+        self.source = sys.intern(source)
+        self._thumbnail = None if thumbnail == self._derived_thumbnail() else thumbnail
+        self.lavalink_track = lavalink_track
+
+    @property
+    def thumbnail(self) -> Optional[str]:
+        return self._thumbnail or self._derived_thumbnail()
+
+    @thumbnail.setter
+    def thumbnail(self, value: Optional[str]) -> None:
+        self._thumbnail = None if value == self._derived_thumbnail() else value
+
+    @property
+    def lavalink_track(self) -> Optional[str]:
+        blob = self._blob
+        if isinstance(blob, bytes):
+            return base64.b64encode(blob).decode("ascii")
+        return blob
+
+    @lavalink_track.setter
+    def lavalink_track(self, value: Optional[str]) -> None:
+        if value and self.store_blobs_as_bytes:
+            try:
+                self._blob = base64.b64decode(value, validate=True)
+                return
+            except binascii.Error:
+                pass
+        self._blob = value
 
-    title: str
-    uri: str
-    duration: int
-    requester_id: int
-    source: str
-    thumbnail: Optional[str] = None
-    lavalink_track: Optional[str] = None
+    def _derived_thumbnail(self) -> Optional[str]:
+        if self.source != "youtube":
+            return None
+        identifier = _youtube_identifier(self.uri)
+        if identifier:
+            return f"https://img.youtube.com/vi/{identifier}/hqdefault.jpg"
+        return None
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Track):
+            return NotImplemented
+        return (
+            self.title == other.title
+            and self.uri == other.uri
+            and self.duration == other.duration
+            and self.requester_id == other.requester_id
+            and self.source == other.source
+            and self._thumbnail == other._thumbnail
+            and self._blob == other._blob
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return (
+            f"Track(title={self.title!r}, uri={self.uri!r}, duration={self.duration!r}, "
+            f"requester_id={self.requester_id!r}, source={self.source!r})"
+        )
 
     @classmethod
     def from_lavalink(cls, data: Dict[str, Any], requester_id: int) -> "Track":
@@ -29,6 +160,21 @@ class Track:
             lavalink_track=data.get("track"),
         )
 
+    @classmethod
+    def from_encoded(cls, encoded: str, requester_id: int) -> "Track":
+        """Build a track straight from an encoded Lavalink blob."""
+        return cls.from_lavalink({"track": encoded, "info": decode_lavalink_track(encoded)}, requester_id)
+
+    def with_requester(self, requester_id: int) -> "Track":
+        if requester_id == self.requester_id:
+            return self
+        # copy slots directly so the encoded blob and strings are shared, not rebuilt
+        clone = Track.__new__(Track)
+        for slot in Track.__slots__:
+            setattr(clone, slot, getattr(self, slot))
+        clone.requester_id = requester_id
+        return clone
+
     def to_dict(self) -> Dict[str, Any]:
         return {
             "title": self.title,
@@ -42,6 +188,9 @@ class Track:
 
     @classmethod
     def from_dict(cls, payload: Dict[str, Any]) -> "Track":
+        if "title" not in payload and payload.get("lavalink_track"):
+            # shared queue dumps may carry only the encoded track
+            return cls.from_encoded(payload["lavalink_track"], int(payload.get("requester_id", 0)))
         return cls(
             title=payload.get("title", "Unknown Track"),
             uri=payload.get("uri", ""),
@@ -55,8 +204,33 @@ class Track:
     @staticmethod
     def _extract_thumbnail(info: Dict[str, Any]) -> Optional[str]:
         if info.get("artworkUrl"):
+            # only dropped by Track when it equals the URI-derived thumbnail
             return info["artworkUrl"]
         identifier = info.get("identifier")
         if info.get("sourceName") == "youtube" and identifier:
             return f"https://img.youtube.com/vi/{identifier}/hqdefault.jpg"
         return None
+
+
+def _youtube_identifier(uri: str) -> Optional[str]:
+    if "youtube.com/watch" in uri:
+        for param in uri.partition("?")[2].split("&"):
+            key, _, value = param.partition("=")
+            if key == "v" and value:
+                return value
+        return None
+    if "youtu.be/" in uri:
+        return uri.rpartition("youtu.be/")[2].split("?")[0] or None
+    return None
+
+
+@dataclass
+class LoadResult:
+    """Tracks returned by a Lavalink load, with playlist metadata when the query was a playlist."""
+
+    tracks: List[Track]
+    playlist_name: Optional[str] = None
+
+    @property
+    def is_playlist(self) -> bool:
+        return self.playlist_name is not None
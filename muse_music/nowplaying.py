@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, Optional, Tuple
+
+import discord
+
+from .embeds import now_playing_embed
+from .player import GuildPlayer, PlayerController
+
+log = logging.getLogger("red.muse_music.nowplaying")
+
+RenderKey = Tuple[Optional[int], int, bool]
+
+
+class NowPlayingManager:
+    """Owns one live now-playing message per guild and edits them under a global budget.
+
+    Guild state is sampled every ``tick`` seconds, and a guild is only queued for
+    an edit when its visible state (track, filled progress cells, paused) changed.
+    Pending guilds are edited round-robin at no more than ``edits_per_second``
+    across the whole bot, and a guild that changes again while queued is edited
+    once with its latest state.
+    """
+
+    def __init__(self, controller: PlayerController, *, edits_per_second: float = 4.0, tick: float = 2.0):
+        self.controller = controller
+        self.edits_per_second = edits_per_second
+        self.tick = tick
+        self._messages: Dict[int, discord.Message] = {}
+        self._rendered: Dict[int, RenderKey] = {}
+        self._pending: "OrderedDict[int, None]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        self._last_sample = 0.0
+        self.edits = 0
+        self.skipped = 0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._messages.clear()
+        self._rendered.clear()
+        self._pending.clear()
+
+    def attach(self, guild_id: int, message: discord.Message, player: GuildPlayer) -> None:
+        """Make ``message`` the live panel for the guild, replacing any previous one."""
+        self._messages[guild_id] = message
+        self._rendered[guild_id] = self._render_key(player)
+        self._pending.pop(guild_id, None)
+
+    def detach(self, guild_id: int) -> None:
+        self._messages.pop(guild_id, None)
+        self._rendered.pop(guild_id, None)
+        self._pending.pop(guild_id, None)
+
+    @staticmethod
+    def _render_key(player: GuildPlayer) -> RenderKey:
+        track = player.current
+        return (id(track) if track else None, player.progress_cells(), player.position.paused)
+
+    def _sample(self) -> None:
+        for guild_id in list(self._messages):
+            player = self.controller.players.get(guild_id)
+            if player is None:
+                # evicted players have nothing playing, so there is nothing left to show
+                self.detach(guild_id)
+                continue
+            if self._render_key(player) != self._rendered.get(guild_id):
+                self._pending[guild_id] = None
+            else:
+                self.skipped += 1
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                now = monotonic()
+                if now - self._last_sample >= self.tick:
+                    self._last_sample = now
+                    self._sample()
+                if not self._pending:
+                    await asyncio.sleep(self.tick)
+                    continue
+                guild_id, _ = self._pending.popitem(last=False)
+                await self._edit(guild_id)
+                await asyncio.sleep(1 / self.edits_per_second)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Now-playing update loop failed")
+                await asyncio.sleep(self.tick)
+
+    async def _edit(self, guild_id: int) -> None:
+        message = self._messages.get(guild_id)
+        player = self.controller.players.get(guild_id)
+        if message is None or player is None:
+            return
+        # render from the latest state, so bursts of changes collapse into this one edit
+        key = self._render_key(player)
+        try:
+            await message.edit(embed=now_playing_embed(player))
+        except (discord.NotFound, discord.Forbidden):
+            self.detach(guild_id)
+            return
+        except discord.HTTPException:
+            log.debug("Failed to edit now-playing message in guild %s", guild_id, exc_info=True)
+            return
+        self._rendered[guild_id] = key
+        self.edits += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "panels": len(self._messages),
+            "pending": len(self._pending),
+            "edits": self.edits,
+            "skipped": self.skipped,
+        }
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import deque
+from time import monotonic
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+log = logging.getLogger("red.muse_music.pipeline")
+
+Handler = Callable[..., Awaitable[None]]
+
+# events that only report state and are superseded by the next one of the same kind
+COALESCABLE = frozenset({"player_update"})
+
+
+class _Event:
+    __slots__ = ("kind", "handler", "args", "queued_at")
+
+    def __init__(self, kind: str, handler: Handler, args: Tuple[Any, ...]):
+        self.kind = kind
+        self.handler = handler
+        self.args = args
+        self.queued_at = monotonic()
+
+
+class EventPipeline:
+    """Runs Lavalink events off the hook, in order per guild and in parallel across guilds.
+
+    Each guild has its own bounded queue and at most one worker draining it, so a
+    guild's events are handled strictly in arrival order while ``workers`` guilds
+    progress at once. A ``player_update`` that arrives while the previous one is
+    still waiting at the tail of the queue replaces it. Once a guild has
+    ``max_depth`` events waiting, further position updates are dropped;
+    track start and end events are always kept.
+    """
+
+    def __init__(self, *, workers: int = 8, max_depth: int = 64, batch: int = 16, samples: int = 1000):
+        self.workers = workers
+        self.max_depth = max_depth
+        # events a worker handles for one guild before letting other guilds in
+        self.batch = batch
+        self._queues: Dict[int, Deque[_Event]] = {}
+        self._ready: "asyncio.Queue[int]" = asyncio.Queue()
+        self._scheduled: Set[int] = set()
+        self._tasks: List[asyncio.Task] = []
+        self._latency: Deque[float] = deque(maxlen=samples)
+        self._wait: Deque[float] = deque(maxlen=samples)
+        self.handled = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+        self.peak_depth = 0
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._queues.clear()
+        self._scheduled.clear()
+        self._ready = asyncio.Queue()
+
+    def submit(self, guild_id: int, kind: str, handler: Handler, *args: Any) -> None:
+        """Queue ``handler(*args)`` behind the guild's earlier events without waiting for it."""
+        queue = self._queues.setdefault(guild_id, deque())
+        if kind in COALESCABLE:
+            if queue and queue[-1].kind == kind:
+                # only the tail is replaced, so an update never jumps ahead of a track change
+                queue[-1] = _Event(kind, handler, args)
+                self.coalesced += 1
+                return
+            if len(queue) >= self.max_depth:
+                self.dropped += 1
+                return
+        elif len(queue) >= self.max_depth:
+            log.warning("Event queue for guild %s is %s deep", guild_id, len(queue))
+        queue.append(_Event(kind, handler, args))
+        self.peak_depth = max(self.peak_depth, len(queue))
+        if guild_id not in self._scheduled:
+            self._scheduled.add(guild_id)
+            self._ready.put_nowait(guild_id)
+
+    async def _worker(self) -> None:
+        while True:
+            guild_id = await self._ready.get()
+            queue = self._queues.get(guild_id)
+            for _ in range(self.batch):
+                if not queue:
+                    break
+                await self._handle(guild_id, queue.popleft())
+            if queue:
+                # still busy: go to the back of the line so one noisy guild can't starve the rest
+                self._ready.put_nowait(guild_id)
+            else:
+                self._scheduled.discard(guild_id)
+                self._queues.pop(guild_id, None)
+
+    async def _handle(self, guild_id: int, event: _Event) -> None:
+        started = monotonic()
+        self._wait.append(started - event.queued_at)
+        try:
+            await event.handler(*event.args)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self.failed += 1
+            log.exception("Error handling %s for guild %s", event.kind, guild_id)
+        self._latency.append(monotonic() - started)
+        self.handled += 1
+
+    def depth(self, guild_id: Optional[int] = None) -> int:
+        if guild_id is not None:
+            return len(self._queues.get(guild_id, ()))
+        return sum(len(queue) for queue in self._queues.values())
+
+    @staticmethod
+    def _percentile(samples: Deque[float], fraction: float) -> float:
+        if not samples:
+            return 0.0
+        ordered = sorted(samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)] * 1000
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queued": self.depth(),
+            "busy_guilds": len(self._scheduled),
+            "deepest_queue": max((len(queue) for queue in self._queues.values()), default=0),
+            "peak_depth": self.peak_depth,
+            "handled": self.handled,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "handler_p50_ms": round(self._percentile(self._latency, 0.5), 1),
+            "handler_p95_ms": round(self._percentile(self._latency, 0.95), 1),
+            "wait_p95_ms": round(self._percentile(self._wait, 0.95), 1),
+        }
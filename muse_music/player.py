@@ -1,9 +1,13 @@
 from __future__ import annotations
 
 import asyncio
+import logging
+import random
+from collections import OrderedDict
 from enum import Enum
-from typing import Deque, Dict, List, Optional
-from collections import deque
+from pathlib import Path
+from time import monotonic
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import discord
 from discord.abc import Snowflake
@@ -11,7 +15,11 @@ from redbot.core import Config, commands
 from redbot.core.bot import Red
 from redbot.core.utils.chat_formatting import humanize_timedelta
 
+from .journal import QueueJournal
 from .models import Track
+from .tracklist import QueueIndex, TrackQueue, normalize_title
+
+log = logging.getLogger("red.muse_music.player")
 
 
 class LoopMode(str, Enum):
@@ -20,20 +28,214 @@ class LoopMode(str, Enum):
     QUEUE = "queue"
 
 
+class WriteBehindPersister:
+    """Debounces persistence requests for one guild into a single delayed write."""
+
+    def __init__(self, write: Callable[[], Awaitable[None]], delay: float = 2.0):
+        self._write = write
+        self.delay = delay
+        self.dirty = False
+        self.writes = 0
+        self.merged = 0
+        self._task: Optional[asyncio.Task] = None
+        # serializes writes, and tells ``close`` whether one is in progress
+        self._lock = asyncio.Lock()
+
+    def mark_dirty(self) -> None:
+        if self.dirty:
+            self.merged += 1
+        self.dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        while True:
+            await asyncio.sleep(self.delay)
+            await self.flush()
+            # changed again while the write ran, or the write failed: go around once more
+            if not self.dirty or self._task is not asyncio.current_task():
+                return
+
+    async def flush(self) -> None:
+        async with self._lock:
+            if not self.dirty:
+                return
+            self.dirty = False
+            try:
+                await self._write()
+            except Exception:
+                # keep the state dirty so the next flush retries the write
+                self.dirty = True
+                log.exception("Failed to persist queue state")
+                return
+            except BaseException:
+                # cancelled part-way through; the state still has to be written
+                self.dirty = True
+                raise
+            self.writes += 1
+
+    async def close(self) -> None:
+        task = self._task
+        self._task = None
+        if task and not task.done() and task is not asyncio.current_task():
+            if self._lock.locked():
+                # a write is in flight; let it land instead of cutting it off
+                await asyncio.wait({task})
+            else:
+                task.cancel()
+        await self.flush()
+
+
+class PositionTracker:
+    """Interpolates the playback position from the last PlayerUpdate instead of polling Lavalink."""
+
+    __slots__ = ("_position", "_updated_at", "paused")
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self, position: int = 0) -> None:
+        self._position = position
+        self._updated_at = monotonic()
+        self.paused = False
+
+    def update(self, position: int, received_at: Optional[float] = None) -> None:
+        """Record a reported position; ``received_at`` is when the bot got it, on the ``monotonic`` clock.
+
+        Interpolating from the receive time covers the wait before the update is
+        handled without trusting Lavalink's wall clock, which may be skewed.
+        """
+        self._position = position
+        self._updated_at = monotonic() if received_at is None else min(received_at, monotonic())
+
+    def pause(self) -> None:
+        if not self.paused:
+            self._position = self.current()
+            self._updated_at = monotonic()
+            self.paused = True
+
+    def resume(self) -> None:
+        if self.paused:
+            self._updated_at = monotonic()
+            self.paused = False
+
+    def current(self, duration: Optional[int] = None) -> int:
+        position = self._position
+        if not self.paused:
+            position += int((monotonic() - self._updated_at) * 1000)
+        if duration:
+            position = min(position, duration)
+        return position
+
+
+class PlayHistory:
+    """Fixed-capacity ring buffer of recently played tracks, newest last.
+
+    Slots hold references to the played ``Track`` objects themselves, so an
+    entry costs one pointer and the buffer never grows past ``capacity``.
+    """
+
+    __slots__ = ("capacity", "_slots", "_start", "_size", "dirty")
+
+    def __init__(self, capacity: int = 50):
+        self.capacity = capacity
+        self._slots: List[Optional[Track]] = [None] * capacity
+        self._start = 0
+        self._size = 0
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def last(self) -> Optional[Track]:
+        if not self._size:
+            return None
+        return self._slots[(self._start + self._size - 1) % self.capacity]
+
+    def push(self, track: Track) -> None:
+        if not self.capacity:
+            return
+        end = (self._start + self._size) % self.capacity
+        self._slots[end] = track
+        if self._size < self.capacity:
+            self._size += 1
+        else:
+            # full: the write above replaced the oldest entry
+            self._start = (self._start + 1) % self.capacity
+        self.dirty = True
+
+    def pop(self) -> Optional[Track]:
+        """Remove and return the most recently played track."""
+        if not self._size:
+            return None
+        self._size -= 1
+        index = (self._start + self._size) % self.capacity
+        track, self._slots[index] = self._slots[index], None
+        self.dirty = True
+        return track
+
+    def recent(self, start: int = 0, stop: Optional[int] = None) -> List[Track]:
+        """Tracks from newest to oldest, sliced like ``list[start:stop]``."""
+        stop = self._size if stop is None else min(stop, self._size)
+        last = self._start + self._size - 1
+        return [self._slots[(last - i) % self.capacity] for i in range(max(start, 0), stop)]  # type: ignore[misc]
+
+    def extend(self, tracks: Iterable[Track]) -> None:
+        """Push ``tracks`` in play order, oldest first."""
+        for track in tracks:
+            self.push(track)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [track.to_dict() for track in reversed(self.recent())]
+
+
 class GuildPlayer:
     """Stateful queue and playback controller for a single guild."""
 
-    def __init__(self, bot: Red, guild_id: int, config: Config):
+    def __init__(
+        self,
+        bot: Red,
+        guild_id: int,
+        config: Config,
+        *,
+        persist_delay: float = 2.0,
+        journal: Optional[QueueJournal] = None,
+        leftover_journal: Optional[QueueJournal] = None,
+    ):
         self.bot = bot
         self.guild_id = guild_id
         self.config = config
-        self.queue: Deque[Track] = deque()
+        self.journal = journal
+        # journal files from before a switch to the Config backend, migrated on load
+        self.leftover_journal = leftover_journal
+        # kept up to date by the queue itself on every insert and removal
+        self.index = QueueIndex()
+        self.queue: TrackQueue = TrackQueue(index=self.index)
         self.current: Optional[Track] = None
         self.loop_mode: LoopMode = LoopMode.OFF
         self.default_volume: int = 100
         self.autoplay_enabled: bool = False
         self.max_queue_length: int = 200
         self.lock = asyncio.Lock()
+        self.position = PositionTracker()
+        self.history = PlayHistory()
+        self.persister = WriteBehindPersister(self._write_state, delay=persist_delay)
+        self.last_active = monotonic()
+        # the Lavalink player the guild volume was last sent to, and that volume
+        self._volume_player = None
+        self._applied_volume: Optional[int] = None
+        # the track that will follow ``current``, worked out when a track starts
+        self.prepared: Optional[Track] = None
+        self._background: Set[asyncio.Task] = set()
+
+    def touch(self) -> None:
+        self.last_active = monotonic()
+
+    @property
+    def is_idle(self) -> bool:
+        """Whether the player can be evicted: nothing playing and no operation in progress."""
+        return self.current is None and not self.lock.locked()
 
     async def load(self) -> None:
         settings = await self.config.guild_from_id(self.guild_id).all()
@@ -41,18 +243,96 @@ class GuildPlayer:
         self.default_volume = int(settings.get("default_volume", 100))
         self.autoplay_enabled = bool(settings.get("autoplay", False))
         self.max_queue_length = int(settings.get("max_queue_length", 200))
-        for payload in settings.get("queue", []):
-            self.queue.append(Track.from_dict(payload))
+        # whichever backend has data holds the queue: journal files win, as Config's copy
+        # is cleared once they exist, and only one backend keeps a queue after this load
+        payloads = self.journal.replay() if self.journal else None
+        migrated = None
+        if payloads is None and self.leftover_journal is not None:
+            payloads = migrated = self.leftover_journal.replay()
+        if payloads is None:
+            payloads = settings.get("queue", [])
+        tracks = self._restore(payloads)
+        self.queue.extend(tracks)
+        self.history.extend(self._restore(settings.get("history", [])))
+        self.history.dirty = False
+        loop = asyncio.get_running_loop()
+        guild_config = self.config.guild_from_id(self.guild_id)
+        if self.journal:
+            # a skipped entry would shift the positions later log operations refer to
+            skipped = len(tracks) != len(payloads)
+            if skipped or self.journal.log_path.exists() or not self.journal.snapshot_path.exists():
+                # fold a leftover log into a fresh snapshot so the log only holds new operations;
+                # the player is not visible until load returns, so the queue cannot change meanwhile
+                await loop.run_in_executor(None, self.journal.compact, self.queue)
+            if settings.get("queue"):
+                # the journal holds the queue now; a stale Config copy must not return on a switch back
+                await guild_config.queue.clear()
+        elif migrated is not None:
+            await guild_config.queue.set([track.to_dict() for track in self.queue])
+            await loop.run_in_executor(None, self.leftover_journal.discard)  # type: ignore[union-attr]
+
+    def _restore(self, payloads: List[Dict[str, Any]]) -> List[Track]:
+        """Rebuild stored tracks, skipping any whose encoded blob no longer decodes."""
+        tracks = []
+        for payload in payloads:
+            try:
+                tracks.append(Track.from_dict(payload))
+            except ValueError:
+                log.warning("Skipping an unreadable stored track in guild %s", self.guild_id)
+        return tracks
 
     async def persist(self) -> None:
-        await self.config.guild_from_id(self.guild_id).queue.set([t.to_dict() for t in self.queue])
+        """Schedule a write of the queue and loop mode; bursts are merged into one write."""
+        self.persister.mark_dirty()
+
+    async def flush(self) -> None:
+        """Write any pending queue state immediately."""
+        await self._drain_background()
+        await self.persister.close()
+        if self.journal:
+            self.journal.close()
+
+    async def _write_state(self) -> None:
+        if not self.journal:
+            await self.config.guild_from_id(self.guild_id).queue.set([t.to_dict() for t in self.queue])
         await self.config.guild_from_id(self.guild_id).loop_mode.set(self.loop_mode.value)
+        if self.history.dirty:
+            # cleared up front so a play during the write marks it dirty again,
+            # and restored if the write does not land so the persister's retry includes it
+            self.history.dirty = False
+            try:
+                await self.config.guild_from_id(self.guild_id).history.set(self.history.to_list())
+            except BaseException:
+                self.history.dirty = True
+                raise
+
+    def _record(self, op: str, *args) -> None:
+        """Append a queue operation to the journal, compacting once the log grows too long."""
+        if not self.journal:
+            return
+        self.journal.append(op, *args)
+        if self.journal.needs_compaction:
+            self.journal.compact(self.queue)
 
     async def enqueue(self, track: Track) -> None:
-        if len(self.queue) >= self.max_queue_length:
-            raise commands.UserFeedbackCheckFailure("Queue is full for this server.")
-        self.queue.append(track)
-        await self.persist()
+        async with self.lock:
+            if len(self.queue) >= self.max_queue_length:
+                raise commands.UserFeedbackCheckFailure("Queue is full for this server.")
+            self.queue.append(track)
+            self._record("enqueue", track.to_dict())
+            await self.persist()
+
+    async def enqueue_many(self, tracks: List[Track]) -> int:
+        """Append as many tracks as fit under ``max_queue_length`` with a single persist."""
+        async with self.lock:
+            room = self.max_queue_length - len(self.queue)
+            if room <= 0:
+                raise commands.UserFeedbackCheckFailure("Queue is full for this server.")
+            batch = tracks[:room]
+            self.queue.extend(batch)
+            self._record("extend", [track.to_dict() for track in batch])
+            await self.persist()
+            return len(batch)
 
     def peek(self) -> Optional[Track]:
         if self.queue:
@@ -61,82 +341,287 @@ class GuildPlayer:
 
     def pop_next(self) -> Optional[Track]:
         if self.queue:
-            return self.queue.popleft()
+            track = self.queue.popleft()
+            self._record("pop")
+            return track
         return None
 
-    async def remove(self, index: int) -> Track:
-        if index < 1 or index > len(self.queue):
-            raise commands.UserFeedbackCheckFailure("Index is out of range for the queue.")
-        # convert to list for safe removal
-        queue_list: List[Track] = list(self.queue)
-        track = queue_list.pop(index - 1)
-        self.queue = deque(queue_list)
-        await self.persist()
-        return track
+    async def take_next(self) -> Optional[Track]:
+        """``pop_next`` under the lock, for callers outside a queue operation."""
+        async with self.lock:
+            return self.pop_next()
+
+    async def remove(self, index: Union[int, str]) -> Track:
+        """Remove a track by 1-based position, or by a ``locate`` target resolved under the lock."""
+        async with self.lock:
+            if isinstance(index, str):
+                index = self.locate(index)
+            if index < 1 or index > len(self.queue):
+                raise commands.UserFeedbackCheckFailure("Index is out of range for the queue.")
+            track = self.queue.pop(index - 1)
+            self._record("remove", index - 1)
+            await self.persist()
+            return track
+
+    def find(self, text: str, *, requester_id: Optional[int] = None, limit: int = 10) -> List[Tuple[int, Track]]:
+        """Queue positions (1-based) and tracks whose title matches ``text``, best first."""
+        matches = self.index.search(text, requester_id=requester_id, limit=limit)
+        positions = self.queue.positions(matches)
+        return [(positions[id(track)] + 1, track) for track in matches if id(track) in positions]
+
+    def locate(self, target: str) -> int:
+        """Resolve a queue position or a title search to a 1-based position.
+
+        Digits are a position unless a queued title is exactly that text or the
+        number is past the end of the queue; then they are searched as a title.
+        """
+        matches = self.find(target, limit=1)
+        if target.isdigit():
+            exact = matches and normalize_title(matches[0][1].title) == normalize_title(target)
+            if not exact and (1 <= int(target) <= len(self.queue) or not matches):
+                return int(target)
+        if not matches:
+            raise commands.UserFeedbackCheckFailure("No queued track matches that title.")
+        return matches[0][0]
+
+    async def jump(self, voice_channel: discord.VoiceChannel, index: Union[int, str]) -> Track:
+        """Play the track at ``index`` now; the rest of the queue is left in place.
+
+        A string is resolved with ``locate`` under the lock, so a track ending in
+        between cannot shift the queue onto a different track.
+        """
+        async with self.lock:
+            if isinstance(index, str):
+                index = self.locate(index)
+            if index < 1 or index > len(self.queue):
+                raise commands.UserFeedbackCheckFailure("Index is out of range for the queue.")
+            track = self.queue.pop(index - 1)
+            self._record("remove", index - 1)
+            if self.current is not None:
+                self._remember_played(self.current)
+            await self.persist()
+            await self.start_playback(voice_channel, track)
+            return track
 
     async def move(self, start: int, end: int) -> None:
-        if start < 1 or start > len(self.queue) or end < 1 or end > len(self.queue):
-            raise commands.UserFeedbackCheckFailure("Positions must be within the queue range.")
-        queue_list: List[Track] = list(self.queue)
-        track = queue_list.pop(start - 1)
-        queue_list.insert(end - 1, track)
-        self.queue = deque(queue_list)
-        await self.persist()
+        async with self.lock:
+            if start < 1 or start > len(self.queue) or end < 1 or end > len(self.queue):
+                raise commands.UserFeedbackCheckFailure("Positions must be within the queue range.")
+            self.queue.move(start - 1, end - 1)
+            self._record("move", start - 1, end - 1)
+            await self.persist()
 
     async def clear(self) -> None:
-        self.queue.clear()
-        await self.persist()
+        async with self.lock:
+            self.queue.clear()
+            self._record("clear")
+            await self.persist()
+
+    async def shuffle(self) -> int:
+        async with self.lock:
+            items = list(self.queue)
+            random.shuffle(items)
+            self._replace_queue(items)
+            return len(items)
+
+    async def dedupe(self) -> int:
+        """Drop later copies of tracks already in the queue, matched by uri."""
+        seen: Set[str] = set()
+
+        def keep(track: Track) -> bool:
+            key = track.uri or track.title
+            if key in seen:
+                return False
+            seen.add(key)
+            return True
+
+        return await self._filter(keep)
+
+    async def remove_range(self, start: int, end: int) -> int:
+        """Remove queue positions ``start`` through ``end`` inclusive (1-based)."""
+        async with self.lock:
+            if start < 1 or end < start or end > len(self.queue):
+                raise commands.UserFeedbackCheckFailure("Positions must be within the queue range.")
+            self._replace_queue(self.queue[: start - 1] + self.queue[end:])
+            return end - start + 1
+
+    async def remove_requested_by(self, requester_ids: Set[int]) -> int:
+        return await self._filter(lambda track: track.requester_id not in requester_ids)
+
+    async def remove_absent(self, present_ids: Set[int]) -> int:
+        """Remove tracks whose requester is not among ``present_ids``."""
+        return await self._filter(lambda track: track.requester_id in present_ids)
+
+    async def _filter(self, keep: Callable[[Track], bool]) -> int:
+        async with self.lock:
+            items = [track for track in self.queue if keep(track)]
+            removed = len(self.queue) - len(items)
+            if removed:
+                self._replace_queue(items)
+            return removed
+
+    def _replace_queue(self, items: List[Track]) -> None:
+        """Swap in a rebuilt queue with one persist; the journal gets a snapshot rather than n ops."""
+        self.queue[:] = items
+        if self.journal:
+            self.journal.compact(self.queue)
+        self.persister.mark_dirty()
 
     async def set_loop(self, mode: LoopMode) -> None:
-        self.loop_mode = mode
-        await self.persist()
+        async with self.lock:
+            self.loop_mode = mode
+            await self.persist()
 
     async def on_track_end(self, reason: str) -> Optional[Track]:
-        if self.current is None:
-            return None
-        finished = self.current
-        if self.loop_mode == LoopMode.TRACK:
-            return finished
-        if self.loop_mode == LoopMode.QUEUE:
-            self.queue.append(finished)
-        return self.pop_next()
+        async with self.lock:
+            if self.current is None:
+                return None
+            finished = self.current
+            if self.loop_mode == LoopMode.TRACK:
+                return finished
+            self._remember_played(finished)
+            if self.loop_mode == LoopMode.QUEUE:
+                self.queue.append(finished)
+                self._record("enqueue", finished.to_dict())
+            return self.pop_next()
+
+    def _remember_played(self, track: Track) -> None:
+        if self.history.last is track:
+            # TrackEnd already recorded it before the player was stopped
+            return
+        self.history.push(track)
+        # merged into the pending write-behind flush like any other state change
+        self.persister.mark_dirty()
+
+    async def previous(self, voice_channel: discord.VoiceChannel) -> Track:
+        """Replay the most recently finished track, putting the current one back at the front."""
+        async with self.lock:
+            track = self.history.pop()
+            if track is None:
+                raise commands.UserFeedbackCheckFailure("Nothing has been played yet.")
+            if self.current is not None:
+                self.queue.appendleft(self.current)
+                self._record("insert", 0, self.current.to_dict())
+            self.persister.mark_dirty()
+            # the stored blob is played as-is, so nothing is resolved again
+            await self.start_playback(voice_channel, track)
+            return track
 
     async def start_playback(self, voice_channel: discord.VoiceChannel, track: Track) -> None:
-        """Start playback for the provided track through Lavalink."""
+        """Start playback for the provided track through Lavalink.
+
+        ``play`` is sent before any bookkeeping: volume is only re-sent when it
+        changed or the Lavalink player is a new one, and the ``current`` Config
+        write runs in the background.
+        """
         player = await self._get_lavalink_player(voice_channel=voice_channel)
         if player is None:
             raise commands.UserFeedbackCheckFailure("Unable to connect to Lavalink.")
+        self.prepared = None
         self.current = track
-        await player.set_volume(self.default_volume)
-        await player.play(track.lavalink_track, start_time=0)
-        await self.config.guild_from_id(self.guild_id).current.set(track.to_dict())
+        self.position.reset()
+        await self._play(player, track.lavalink_track)
+        self._spawn(self.config.guild_from_id(self.guild_id).current.set(track.to_dict()))
+
+    async def _play(self, player, blob: Optional[str], start: int = 0) -> None:
+        # a reconnect hands us a fresh player that starts at Lavalink's default volume
+        if player is not self._volume_player or self._applied_volume != self.default_volume:
+            await player.set_volume(self.default_volume)
+            self._volume_player = player
+            self._applied_volume = self.default_volume
+        await player.play(blob, start_time=start)
+
+    async def migrate(self, old_player) -> bool:
+        """Replay ``current`` on another node after ``old_player``'s node went down.
+
+        The track resumes at its interpolated position with the guild's volume and
+        paused state; the queue is untouched. Returns False if nothing was playing.
+        """
+        async with self.lock:
+            track = self.current
+            channel = getattr(old_player, "channel", None)
+            if track is None or channel is None:
+                return False
+            position = self.current_position()
+            paused = self.position.paused
+            # leaving the dead node frees the guild, so the reconnect lands on a ready one
+            await old_player.disconnect()
+            player = await self._get_lavalink_player(voice_channel=channel)
+            if player is None or player is old_player:
+                raise commands.UserFeedbackCheckFailure("No other Lavalink node is available.")
+            await self._play(player, track.lavalink_track, start=position)
+            self.position.reset(position)
+            if paused:
+                await player.set_pause(True)
+                self.position.pause()
+            return True
+
+    def prepare_next(self) -> Optional[Track]:
+        """Work out which track follows ``current``; ``None`` means the queue ends with it."""
+        if self.current is None:
+            self.prepared = None
+        elif self.loop_mode == LoopMode.TRACK:
+            self.prepared = self.current
+        elif self.queue:
+            self.prepared = self.queue[0]
+        else:
+            self.prepared = self.current if self.loop_mode == LoopMode.QUEUE else None
+        return self.prepared
+
+    def _spawn(self, coro: Awaitable[None]) -> None:
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background_done)
+
+    async def _drain_background(self) -> None:
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    def _background_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.error("Background write failed for guild %s", self.guild_id, exc_info=task.exception())
 
     async def maybe_start_next(self, voice_channel: discord.VoiceChannel) -> Optional[Track]:
-        if self.current:
-            return self.current
-        next_track = self.pop_next()
-        if next_track:
-            await self.start_playback(voice_channel, next_track)
-            return next_track
-        return None
+        # held across start_playback so two commands cannot both start a track
+        async with self.lock:
+            if self.current:
+                return self.current
+            next_track = self.pop_next()
+            if next_track:
+                await self.start_playback(voice_channel, next_track)
+                return next_track
+            return None
 
     async def stop(self) -> None:
         player = await self._get_lavalink_player()
         if player:
             await player.stop()
+        if self.current is not None:
+            self._remember_played(self.current)
         self.current = None
+        self.prepared = None
+        self.position.reset()
+        # let an in-flight ``current`` write land first so it cannot resurrect the track
+        await self._drain_background()
         await self.config.guild_from_id(self.guild_id).current.clear()
 
     async def set_pause(self, paused: bool) -> None:
         player = await self._get_lavalink_player()
         if player:
             await player.set_pause(paused)
+            if paused:
+                self.position.pause()
+            else:
+                self.position.resume()
 
     async def set_volume(self, level: int) -> None:
         player = await self._get_lavalink_player()
         if not player:
             raise commands.UserFeedbackCheckFailure("Nothing is playing right now.")
         await player.set_volume(level)
+        self.default_volume = self._applied_volume = level
+        self._volume_player = player
 
     async def _get_lavalink_player(self, voice_channel: Optional[discord.VoiceChannel] = None):
         try:
@@ -150,12 +635,26 @@ class GuildPlayer:
             player = lavalink.get_player(self.guild_id)
         return player
 
-    def progress_bar(self, position_ms: int) -> str:
+    def current_position(self) -> int:
+        """Interpolated playback position of the current track in milliseconds."""
         if not self.current:
-            return "[—————]"
+            return 0
+        return self.position.current(self.current.duration)
+
+    def progress_cells(self, position_ms: Optional[int] = None) -> int:
+        """Number of filled cells (0-10) in the progress bar."""
+        if not self.current:
+            return 0
+        if position_ms is None:
+            position_ms = self.current_position()
         length = max(self.current.duration, 1)
         proportion = min(max(position_ms / length, 0), 1)
-        filled = int(proportion * 10)
+        return int(proportion * 10)
+
+    def progress_bar(self, position_ms: Optional[int] = None) -> str:
+        if not self.current:
+            return "[—————]"
+        filled = self.progress_cells(position_ms)
         return "[" + "▮" * filled + "—" * (10 - filled) + "]"  # simple textual bar
 
     def format_track(self, track: Track) -> str:
@@ -164,20 +663,165 @@ class GuildPlayer:
 
 
 class PlayerController:
-    """Manages GuildPlayer instances for the cog."""
-
-    def __init__(self, bot: Red, config: Config):
+    """Manages GuildPlayer instances for the cog.
+
+    Players that have been idle (nothing playing, no recent commands) for
+    ``idle_timeout`` seconds are flushed and dropped, and once more than
+    ``max_resident`` players are in memory the least recently used idle ones go
+    first. ``get_player`` reloads evicted guilds from storage transparently.
+    """
+
+    def __init__(
+        self,
+        bot: Red,
+        config: Config,
+        *,
+        persist_delay: float = 2.0,
+        journal_dir: Optional[Path] = None,
+        use_journal: bool = False,
+        idle_timeout: float = 900.0,
+        max_resident: int = 1000,
+        sweep_interval: float = 60.0,
+    ):
         self.bot = bot
         self.config = config
-        self.players: Dict[int, GuildPlayer] = {}
+        self.persist_delay = persist_delay
+        # where journals live; with ``use_journal`` off, any found there are moved into Config
+        self.journal_dir = journal_dir
+        self.use_journal = use_journal
+        self.idle_timeout = idle_timeout
+        self.max_resident = max_resident
+        self.sweep_interval = sweep_interval
+        self.players: "OrderedDict[int, GuildPlayer]" = OrderedDict()
+        self.loads = 0
+        self.evictions = 0
+        self.peak_resident = 0
+        self._merged_evicted = 0
+        self._loading: Dict[int, asyncio.Task] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+
+    def _make_player(self, guild_id: int) -> GuildPlayer:
+        journal = QueueJournal(self.journal_dir, guild_id) if self.journal_dir else None
+        return GuildPlayer(
+            self.bot,
+            guild_id,
+            self.config,
+            persist_delay=self.persist_delay,
+            journal=journal if self.use_journal else None,
+            leftover_journal=None if self.use_journal else journal,
+        )
 
     async def get_player(self, guild: Snowflake) -> GuildPlayer:
-        if guild.id not in self.players:
-            player = GuildPlayer(self.bot, guild.id, self.config)
-            await player.load()
-            self.players[guild.id] = player
-        return self.players[guild.id]
+        player = self.players.get(guild.id)
+        if player is None:
+            # concurrent callers for a cold guild share one load instead of racing their own
+            task = self._loading.get(guild.id)
+            if task is None:
+                task = asyncio.ensure_future(self._load_player(guild.id))
+                self._loading[guild.id] = task
+                task.add_done_callback(lambda done: self._loading_done(guild.id, done))
+            player = await asyncio.shield(task)
+        else:
+            self.players.move_to_end(guild.id)
+        player.touch()
+        return player
+
+    async def _load_player(self, guild_id: int) -> GuildPlayer:
+        player = self._make_player(guild_id)
+        await player.load()
+        self.loads += 1
+        self.players[guild_id] = player
+        self.peak_resident = max(self.peak_resident, len(self.players))
+        if len(self.players) > self.max_resident:
+            await self._enforce_budget(keep=guild_id)
+        return player
+
+    def _loading_done(self, guild_id: int, task: asyncio.Task) -> None:
+        if self._loading.get(guild_id) is task:
+            del self._loading[guild_id]
+        if not task.cancelled():
+            task.exception()
+
+    def start(self) -> None:
+        if self._sweeper is None:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.evict_idle()
+            except Exception:
+                log.exception("Failed to evict idle players")
+
+    async def evict_idle(self) -> int:
+        """Flush and drop every player that has been idle for longer than ``idle_timeout``."""
+        cutoff = monotonic() - self.idle_timeout
+        stale = [gid for gid, player in self.players.items() if player.is_idle and player.last_active <= cutoff]
+        evicted = 0
+        for guild_id in stale:
+            # the guild may have been used while earlier guilds were flushing
+            evicted += await self._evict(guild_id, cutoff=cutoff)
+        return evicted
+
+    async def _enforce_budget(self, keep: int) -> None:
+        # players are kept in LRU order, so walk from the least recently used end
+        for guild_id in [gid for gid, player in self.players.items() if player.is_idle and gid != keep]:
+            if len(self.players) <= self.max_resident:
+                break
+            await self._evict(guild_id)
+
+    async def _evict(self, guild_id: int, cutoff: Optional[float] = None) -> bool:
+        """Flush the player, then drop it only if it is still idle once the write has landed.
+
+        The player stays resident while it flushes, so ``get_player`` keeps returning
+        the live object instead of reloading state that has not been written yet.
+        """
+        player = self.players.get(guild_id)
+        if player is None or not self._evictable(player, cutoff):
+            return False
+        await player.flush()
+        # no await between this check and the pop, so nothing can slip in between
+        if self.players.get(guild_id) is not player or not self._evictable(player, cutoff):
+            return False
+        if player.persister.dirty:
+            return False
+        del self.players[guild_id]
+        self._merged_evicted += player.persister.merged
+        self.evictions += 1
+        return True
+
+    @staticmethod
+    def _evictable(player: GuildPlayer, cutoff: Optional[float]) -> bool:
+        return player.is_idle and (cutoff is None or player.last_active <= cutoff)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "resident": len(self.players),
+            "peak_resident": self.peak_resident,
+            "max_resident": self.max_resident,
+            "playing": sum(1 for player in self.players.values() if player.current),
+            "loads": self.loads,
+            "loading": len(self._loading),
+            "evictions": self.evictions,
+        }
+
+    @property
+    def merged_writes(self) -> int:
+        """Number of queue writes absorbed by debouncing across all players."""
+        return self._merged_evicted + sum(player.persister.merged for player in self.players.values())
+
+    async def flush_all(self) -> None:
+        await asyncio.gather(*(player.flush() for player in self.players.values()))
 
     async def teardown(self) -> None:
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            self._sweeper = None
+        await self.flush_all()
+        log.debug(
+            "Flushed %s players; %s queue writes were merged away",
+            len(self.players),
+            self.merged_writes,
+        )
         self.players.clear()
-
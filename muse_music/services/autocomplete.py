@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import OrderedDict
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+import discord
+from discord import app_commands
+
+from ..models import Track
+from .resolver import URL_RE, ResolverService
+
+log = logging.getLogger("red.muse_music.autocomplete")
+
+
+class AutocompletePipeline:
+    """Per-user /play autocomplete that waits for a typing pause and drops stale keystrokes."""
+
+    def __init__(
+        self,
+        resolver: ResolverService,
+        *,
+        debounce: float = 0.3,
+        budget: float = 2.5,
+        recent_size: int = 1000,
+    ):
+        self.resolver = resolver
+        self.debounce = debounce
+        # Discord drops autocomplete responses after 3 seconds
+        self.budget = budget
+        self.recent_size = recent_size
+        self._pending: Dict[int, asyncio.Task] = {}
+        self._recent: "OrderedDict[int, Tuple[str, List[Track]]]" = OrderedDict()
+        self.superseded = 0
+        self.local_answers = 0
+        self.timeouts = 0
+
+    async def complete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
+        started = monotonic()
+        if len(current) < 2:
+            return []
+        user = interaction.user
+        if not user or not getattr(user, "voice", None) or not user.voice.channel:
+            return []
+        if URL_RE.match(current):
+            return [app_commands.Choice(name=current[:100], value=current)]
+        key = self.resolver.text_key(current)
+
+        local = self._answer_locally(user.id, key)
+        if local is not None:
+            self.local_answers += 1
+            return self._choices(local)
+
+        previous = self._pending.get(user.id)
+        if previous is not None and not previous.done():
+            previous.cancel()
+            self.superseded += 1
+        task = asyncio.ensure_future(self._debounced_search(current, user))
+        self._pending[user.id] = task
+        try:
+            remaining = self.budget - (monotonic() - started)
+            done, _ = await asyncio.wait({task}, timeout=max(remaining, 0))
+        finally:
+            if self._pending.get(user.id) is task:
+                del self._pending[user.id]
+        if not done:
+            task.cancel()
+            self.timeouts += 1
+            return []
+        if task.cancelled() or task.exception() is not None:
+            return []
+        results = task.result()
+        self._remember(user.id, key, results)
+        return self._choices(results)
+
+    async def _debounced_search(self, text: str, user: discord.abc.User) -> List[Track]:
+        await asyncio.sleep(self.debounce)
+        return await self.resolver.search_text(text, user)  # type: ignore[arg-type]
+
+    def _answer_locally(self, user_id: int, key: str) -> Optional[List[Track]]:
+        cached = self.resolver.cache.get(key)
+        if cached is not None:
+            # includes known-empty results, which should not be searched again
+            return cached.tracks
+        if self.resolver.failures.get(key) is not None:
+            return []
+        recent = self._recent.get(user_id)
+        if recent is not None and recent[0].startswith(key) and recent[1]:
+            # the user backspaced: results for the longer text still match what they typed
+            return recent[1]
+        return None
+
+    def _remember(self, user_id: int, key: str, results: List[Track]) -> None:
+        self._recent[user_id] = (key, results)
+        self._recent.move_to_end(user_id)
+        while len(self._recent) > self.recent_size:
+            self._recent.popitem(last=False)
+
+    def _choices(self, results: List[Track]) -> List[app_commands.Choice[str]]:
+        choices: List[app_commands.Choice[str]] = []
+        for track in results[:25]:
+            duration = self.resolver._format_duration(track.duration)
+            name = f"{track.title} ({duration})"
+            choices.append(app_commands.Choice(name=name[:100], value=track.uri or track.title))
+        return choices
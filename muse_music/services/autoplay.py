@@ -1,29 +1,152 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from typing import Optional
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional, Tuple
 
-import discord
-
-from ..models import Track
+from ..models import Track, _youtube_identifier
+from ..tracklist import normalize_title
 from .resolver import ResolverService
 
 log = logging.getLogger("red.muse_music.autoplay")
 
 
 class AutoplayService:
-    """Optional related-track enqueueing when queues end."""
+    """Related-track autoplay that avoids recently played songs.
+
+    Every started track is remembered in a bounded per-guild history. When the
+    last queued track starts, a pool of related candidates is fetched in the
+    background, so by the time the queue runs dry the next track is picked from
+    memory instead of waiting on a search.
+    """
 
-    def __init__(self, resolver: ResolverService):
+    def __init__(
+        self,
+        resolver: ResolverService,
+        *,
+        history_size: int = 50,
+        pool_size: int = 10,
+        max_guilds: int = 1000,
+    ):
         self.resolver = resolver
+        self.history_size = history_size
+        self.pool_size = pool_size
+        self.max_guilds = max_guilds
+        self._history: "OrderedDict[int, OrderedDict[str, None]]" = OrderedDict()
+        # guild -> (seed key, candidates), filled ahead of time by ``prefetch``
+        self._pools: Dict[int, Tuple[str, List[Track]]] = {}
+        self._prefetching: Dict[int, Tuple[str, asyncio.Task]] = {}
+        self.prefetch_hits = 0
+        self.prefetch_misses = 0
+
+    @staticmethod
+    def _keys(track: Track) -> Iterator[str]:
+        # re-uploads of a song have different URIs but (nearly) the same title
+        if track.uri:
+            yield track.uri
+        title = normalize_title(track.title)
+        if title:
+            yield f"title:{title}"
+
+    def remember(self, guild_id: int, track: Track) -> None:
+        """Record that ``track`` played in the guild."""
+        history = self._history.pop(guild_id, None)
+        if history is None:
+            history = OrderedDict()
+        self._history[guild_id] = history
+        while len(self._history) > self.max_guilds:
+            self._history.popitem(last=False)
+        for key in self._keys(track):
+            history[key] = None
+            history.move_to_end(key)
+        while len(history) > 2 * self.history_size:
+            history.popitem(last=False)
+
+    def _played(self, guild_id: int, track: Track) -> bool:
+        history = self._history.get(guild_id)
+        return history is not None and any(key in history for key in self._keys(track))
+
+    def prefetch(self, guild_id: int, seed: Track) -> None:
+        """Start fetching candidates related to ``seed`` without waiting for them."""
+        seed_key = seed.uri or seed.title
+        pool = self._pools.get(guild_id)
+        if pool is not None and pool[0] == seed_key:
+            return
+        running = self._prefetching.get(guild_id)
+        if running is not None:
+            if running[0] == seed_key:
+                return
+            running[1].cancel()
+        task = asyncio.ensure_future(self._fill_pool(guild_id, seed, seed_key))
+        self._prefetching[guild_id] = (seed_key, task)
+        task.add_done_callback(lambda done: self._prefetch_done(guild_id, done))
 
-    async def maybe_autoplay(self, *, last_track: Optional[Track], requester: discord.Member) -> Optional[Track]:
+    def _prefetch_done(self, guild_id: int, task: asyncio.Task) -> None:
+        running = self._prefetching.get(guild_id)
+        if running is not None and running[1] is task:
+            del self._prefetching[guild_id]
+        if not task.cancelled() and task.exception() is not None:
+            log.debug("Autoplay prefetch failed for guild %s", guild_id, exc_info=task.exception())
+
+    async def _fill_pool(self, guild_id: int, seed: Track, seed_key: str) -> None:
+        candidates = await self._related(seed)
+        self._pools[guild_id] = (seed_key, candidates)
+
+    async def _related(self, seed: Track) -> List[Track]:
+        queries = []
+        identifier = _youtube_identifier(seed.uri)
+        if identifier:
+            # YouTube's radio mix for the video is a better "related" list than a title search
+            queries.append(f"https://www.youtube.com/watch?v={identifier}&list=RD{identifier}")
+        queries.append(f"ytsearch:{seed.title}")
+        seed_keys = set(self._keys(seed))
+        for query in queries:
+            try:
+                result = await self.resolver.load(query)
+            except Exception:
+                log.debug("Autoplay lookup %r failed", query, exc_info=True)
+                continue
+            candidates = [track for track in result.tracks if seed_keys.isdisjoint(self._keys(track))]
+            if candidates:
+                return candidates[: self.pool_size * 2]
+        return []
+
+    async def maybe_autoplay(self, guild_id: int, *, last_track: Optional[Track], requester_id: int) -> Optional[Track]:
+        """Pick the next autoplay track, from the prefetched pool when it is ready."""
         if not last_track:
             return None
-        query = f"ytsearch:{last_track.title}"
-        try:
-            results = await self.resolver.search(query, requester)
-        except Exception:
-            log.debug("Autoplay search failed", exc_info=True)
-            return None
-        return results[0] if results else None
+        seed_key = last_track.uri or last_track.title
+        pool = self._pools.pop(guild_id, None)
+        if pool is None or pool[0] != seed_key:
+            self.prefetch_misses += 1
+            running = self._prefetching.get(guild_id)
+            if running is None or running[0] != seed_key:
+                self.prefetch(guild_id, last_track)
+                running = self._prefetching[guild_id]
+            # wait without propagating a cancellation of the shared prefetch into the caller
+            await asyncio.wait({running[1]})
+            pool = self._pools.pop(guild_id, None)
+            if pool is None or pool[0] != seed_key:
+                return None
+        else:
+            self.prefetch_hits += 1
+        for track in pool[1]:
+            if not self._played(guild_id, track):
+                return track.with_requester(requester_id)
+        return None
+
+    def forget(self, guild_id: int) -> None:
+        self._pools.pop(guild_id, None)
+        running = self._prefetching.pop(guild_id, None)
+        if running is not None:
+            running[1].cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "guilds": len(self._history),
+            "pools": len(self._pools),
+            "prefetching": len(self._prefetching),
+            "prefetch_hits": self.prefetch_hits,
+            "prefetch_misses": self.prefetch_misses,
+        }
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from time import time
+from typing import Any, Callable, Optional, TypeVar
+
+from ..models import LoadResult, Track
+
+log = logging.getLogger("red.muse_music.diskcache")
+
+T = TypeVar("T")
+
+
+class DiskCache:
+    """SQLite second-tier cache of resolved queries that survives restarts.
+
+    Every statement runs on a single worker thread, so the event loop never
+    waits on disk I/O and the connection is only ever touched from one thread.
+    Writes are fire-and-forget; once the table grows past ``max_entries`` the
+    least recently read rows are dropped along with anything expired.
+    """
+
+    def __init__(self, path: Path, *, ttl: float = 7 * 24 * 3600, max_entries: int = 20000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="muse-diskcache")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def open(self) -> None:
+        await self._run(self._open)
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS resolutions ("
+            " key TEXT PRIMARY KEY, payload TEXT NOT NULL, expires REAL NOT NULL,"
+            " accessed REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS resolutions_accessed ON resolutions (accessed)")
+        conn.commit()
+        self._conn = conn
+
+    async def get(self, key: str) -> Optional[LoadResult]:
+        if self._conn is None:
+            return None
+        try:
+            payload = await self._run(self._get, key)
+            result = None if payload is None else self._decode(payload)
+        except (sqlite3.Error, ValueError, KeyError):
+            # a broken cache must never fail the search; Lavalink answers instead
+            log.warning("Disk cache read failed for %r", key, exc_info=True)
+            result = None
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def _get(self, key: str) -> Optional[str]:
+        if self._conn is None:
+            return None
+        now = time()
+        row = self._conn.execute(
+            "SELECT payload FROM resolutions WHERE key = ? AND expires > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE resolutions SET accessed = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        self._conn.commit()
+        return row[0]
+
+    def put(self, key: str, result: LoadResult) -> None:
+        """Queue a write without waiting for it."""
+        if self._conn is None:
+            return
+        payload = json.dumps(
+            {"playlist_name": result.playlist_name, "tracks": [track.to_dict() for track in result.tracks]},
+            separators=(",", ":"),
+        )
+        future = self._executor.submit(self._put, key, payload)
+        future.add_done_callback(self._log_failure)
+
+    def _put(self, key: str, payload: str) -> None:
+        if self._conn is None:
+            # closed while this write was queued
+            return
+        now = time()
+        self._conn.execute(
+            "INSERT INTO resolutions (key, payload, expires, accessed) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET payload = excluded.payload, expires = excluded.expires,"
+            " accessed = excluded.accessed",
+            (key, payload, now + self.ttl, now),
+        )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self._evict(now)
+        self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        assert self._conn is not None
+        self._conn.execute("DELETE FROM resolutions WHERE expires <= ?", (now,))
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM resolutions").fetchone()
+        excess = count - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM resolutions WHERE key IN (SELECT key FROM resolutions ORDER BY accessed LIMIT ?)",
+                (excess,),
+            )
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            # queued behind any pending writes on the single worker, so they land first
+            await self._run(self._close)
+        self._executor.shutdown(wait=False)
+
+    def _close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    @staticmethod
+    def _decode(payload: str) -> LoadResult:
+        data = json.loads(payload)
+        return LoadResult([Track.from_dict(item) for item in data["tracks"]], data.get("playlist_name"))
+
+    @staticmethod
+    def _log_failure(future: Future) -> None:
+        if not future.cancelled() and future.exception() is not None:
+            log.error("Disk cache write failed", exc_info=future.exception())
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import itertools
+from contextlib import contextmanager
+from typing import Any, Collection, Dict, Iterator, List, Optional, Sequence
+
+
+def node_key(node: Any) -> str:
+    """Stable name for a node; Red-Lavalink nodes have no name, only an address."""
+    name = getattr(node, "name", None)
+    if name:
+        return name
+    host = getattr(node, "host", None)
+    if host is not None:
+        return f"{host}:{getattr(node, 'port', '')}"
+    return "default"
+
+
+def node_ready(node: Any) -> bool:
+    ready = getattr(node, "ready", None)
+    if ready is None:
+        ready = getattr(node, "available", True)
+    return bool(ready)
+
+
+def node_load(node: Any) -> float:
+    """Score a node from its last Lavalink ``stats`` op; lower is better.
+
+    Playing players dominate, idle connected players count for a little, and
+    CPU load and frame deficits grow exponentially so a struggling node is
+    avoided well before it starts dropping audio.
+    """
+    stats = getattr(node, "stats", None)
+    if stats is None:
+        return 0.0
+    # nodes report -1 for frame counters until they have a sample
+    deficit = max(getattr(stats, "frames_deficit", 0), 0)
+    nulled = max(getattr(stats, "frames_nulled", 0), 0)
+    idle_players = max(stats.players - stats.playing_players, 0)
+    cpu_penalty = 1.05 ** (100 * stats.system_load) * 10 - 10
+    deficit_penalty = 1.03 ** (500 * (deficit / 3000)) * 600 - 600
+    nulled_penalty = (1.03 ** (500 * (nulled / 3000)) * 300 - 300) * 2
+    return stats.playing_players + idle_players * 0.25 + cpu_penalty + deficit_penalty + nulled_penalty
+
+
+class SearchBalancer:
+    """Spreads REST searches across every ready Lavalink node.
+
+    The node with the fewest searches in flight wins, then the lowest
+    :func:`node_load`; a rotating offset breaks remaining ties round-robin.
+    Playback placement is left to the Lavalink client, which already assigns
+    each guild's player to a node.
+    """
+
+    def __init__(self) -> None:
+        self.in_flight: Dict[str, int] = {}
+        self._order = itertools.count()
+
+    def pick(self, nodes: Sequence[Any], *, skip: Collection[str] = ()) -> Optional[Any]:
+        pool: List[Any] = [node for node in nodes if node_ready(node) and node_key(node) not in skip]
+        if not pool:
+            return None
+        offset = next(self._order) % len(pool)
+        ranked = pool[offset:] + pool[:offset]
+        return min(ranked, key=lambda node: (self.in_flight.get(node_key(node), 0), node_load(node)))
+
+    @contextmanager
+    def track(self, node: Any) -> Iterator[None]:
+        key = node_key(node)
+        self.in_flight[key] = self.in_flight.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            self.in_flight[key] -= 1
+            if not self.in_flight[key]:
+                del self.in_flight[key]
@@ -3,89 +3,401 @@ from __future__ import annotations
 import asyncio
 import logging
 import re
+from collections import OrderedDict
 from time import monotonic
-from typing import List, Optional
+from typing import Any, Callable, Dict, Generic, List, Optional, Sequence, Tuple, TypeVar
 
 import discord
-from discord import app_commands
 from redbot.core import commands
 
-from ..models import Track
+from ..models import LoadResult, Track, _youtube_identifier
+from ..tracklist import normalize_title
+from .diskcache import DiskCache
+from .nodes import SearchBalancer, node_key
 
 log = logging.getLogger("red.muse_music.resolver")
 
 URL_RE = re.compile(r"https?://")
+PLAYLIST_LOAD_TYPES = ("PLAYLIST_LOADED", "playlist")
+FAILED_LOAD_TYPES = ("LOAD_FAILED", "error")
+SEARCH_PREFIXES = ("ytsearch", "scsearch", "ytmsearch")
 
+V = TypeVar("V")
 
-class TimedCache:
-    def __init__(self, ttl: float = 8.0, maxsize: int = 32):
+
+class LRUCache(Generic[V]):
+    """Least-recently-used cache with lazy per-entry expiry and runtime counters."""
+
+    def __init__(self, ttl: float = 10.0, maxsize: int = 512):
         self.ttl = ttl
         self.maxsize = maxsize
-        self._cache = {}
+        self._cache: "OrderedDict[str, Tuple[float, V]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._cache)
 
-    def _prune(self) -> None:
-        now = monotonic()
-        self._cache = {k: v for k, v in self._cache.items() if now - v[0] < self.ttl}
+    def get(self, key: str) -> Optional[V]:
+        entry = self._cache.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= monotonic():
+            del self._cache[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: V, ttl: Optional[float] = None) -> None:
+        self._cache[key] = (monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._cache.move_to_end(key)
         while len(self._cache) > self.maxsize:
-            self._cache.pop(next(iter(self._cache)))
+            self._cache.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._cache),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class CircuitBreaker:
+    """Stops calling a node that keeps failing until a cooldown has passed.
+
+    After ``threshold`` consecutive failures the breaker opens and rejects calls
+    for ``cooldown`` seconds; then a single trial call is let through and its
+    outcome decides whether the breaker closes again or re-opens.
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_running = False
 
-    def get(self, key: str) -> Optional[List[Track]]:
-        self._prune()
-        if key in self._cache:
-            return self._cache[key][1]
-        return None
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
 
-    def set(self, key: str, value: List[Track]) -> None:
-        self._prune()
-        self._cache[key] = (monotonic(), value)
+    @property
+    def rejecting(self) -> bool:
+        """Whether ``allow`` would turn a call away right now."""
+        if self.opened_at is None:
+            return False
+        return self._trial_running or monotonic() - self.opened_at < self.cooldown
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.rejecting:
+            return False
+        self._trial_running = True
+        return True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = monotonic()
+
+    def record_cancelled(self) -> None:
+        """A call was abandoned before the node answered."""
+        if self._trial_running:
+            # the trial proved nothing; count it as failed so the slot is freed and the cooldown restarts
+            self.record_failure()
 
 
 class ResolverService:
     """Resolves user queries to Lavalink tracks without enqueuing."""
 
-    def __init__(self):
-        self.cache = TimedCache(ttl=10.0, maxsize=64)
-        self.lock = asyncio.Lock()
+    def __init__(
+        self,
+        *,
+        cache_size: int = 512,
+        cache_ttl: float = 10.0,
+        index_size: int = 2048,
+        index_ttl: float = 900.0,
+        node_provider: Optional[Callable[[], Sequence[Any]]] = None,
+        disk: Optional[DiskCache] = None,
+        negative_ttl: float = 60.0,
+        failure_ttl: float = 15.0,
+        federated_sources: Tuple[str, ...] = ("ytsearch:", "scsearch:"),
+        source_timeout: float = 2.0,
+        merge_grace: float = 0.25,
+    ):
+        self.cache: LRUCache[LoadResult] = LRUCache(ttl=cache_ttl, maxsize=cache_size)
+        # URI/identifier -> already-resolved track, so submitting an autocompleted URI skips REST
+        self.resolved: LRUCache[Track] = LRUCache(ttl=index_ttl, maxsize=index_size)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.coalesced = 0
+        # returns the candidate nodes for searches; defaults to every node Lavalink knows about
+        self.node_provider = node_provider
+        self.disk = disk
+        # empty results live in ``cache`` for this long; hits are kept in memory only
+        # for ``cache_ttl`` but stay on disk much longer
+        self.negative_ttl = negative_ttl
+        # query -> user-facing error for loads that Lavalink reported as failed
+        self.failures: LRUCache[str] = LRUCache(ttl=failure_ttl, maxsize=cache_size)
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.balancer = SearchBalancer()
+        self.federated = False
+        self.federated_sources = federated_sources
+        self.source_timeout = source_timeout
+        self.merge_grace = merge_grace
 
     async def search(self, query: str, requester: discord.Member) -> List[Track]:
-        cached = self.cache.get(query)
-        if cached:
-            return cached
+        result = await self.load(query)
+        # cached tracks are shared across guilds, so stamp them for this requester
+        return [track.with_requester(requester.id) for track in result.tracks[:25]]
+
+    async def search_text(self, text: str, requester: discord.Member) -> List[Track]:
+        """Search free text typed by a user, honouring ``yt:``/``sc:`` prefixes and federated mode."""
+        if self._is_federated(text):
+            return await self.federated_search(text, requester)
+        prefix, terms = self._parse_prefix(text)
+        return await self.search(f"{prefix}{terms}", requester)
+
+    def text_key(self, text: str) -> str:
+        """Cache key that ``search_text`` resolves ``text`` under."""
+        if self._is_federated(text):
+            return self._normalize_query(f"federated:{text}").lower()
+        prefix, terms = self._parse_prefix(text)
+        return self._normalize_query(f"{prefix}{terms}")
+
+    def _is_federated(self, text: str) -> bool:
+        return (
+            self.federated
+            and len(self.federated_sources) > 1
+            and not URL_RE.match(text)
+            and not text.lower().startswith(("yt:", "sc:"))
+        )
+
+    async def federated_search(self, terms: str, requester: discord.Member) -> List[Track]:
+        """Query every federated source at once and merge whatever arrives in time.
+
+        Each source gets ``source_timeout`` seconds. Once the first source returns
+        tracks, the others only get ``merge_grace`` more seconds, so latency follows
+        the fastest healthy source instead of the slowest.
+        """
+        key = self.text_key(terms)
+        cached = self.cache.get(key)
+        if cached is None:
+            tracks, answered = await self._gather_sources(terms)
+            if not answered:
+                # an outage is not "no results"; don't let it stick for negative_ttl
+                raise commands.UserFeedbackCheckFailure("No search source answered in time. Try again shortly.")
+            cached = LoadResult(tracks)
+            self._remember(key, cached)
+        return [track.with_requester(requester.id) for track in cached.tracks[:25]]
+
+    async def _gather_sources(self, terms: str) -> Tuple[List[Track], bool]:
+        """Merged tracks, and whether any source actually answered (possibly with nothing)."""
+        tasks = {asyncio.ensure_future(self.load(f"{source}{terms}")): source for source in self.federated_sources}
+        arrived: List[List[Track]] = []
+        answered = False
+        pending = set(tasks)
+        deadline = monotonic() + self.source_timeout
+        try:
+            while pending:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    if task.exception() is not None:
+                        log.debug("Federated source %s failed", tasks[task], exc_info=task.exception())
+                        continue
+                    answered = True
+                    if task.result().tracks:
+                        arrived.append(task.result().tracks)
+                if arrived:
+                    deadline = min(deadline, monotonic() + self.merge_grace)
+        finally:
+            for task in pending:
+                task.cancel()
+        return self._merge(arrived), answered
+
+    @staticmethod
+    def _merge(result_lists: List[List[Track]]) -> List[Track]:
+        """Interleave results by rank in arrival order, dropping cross-source duplicates."""
+        merged: List[Track] = []
+        seen = set()
+        for rank in range(max((len(tracks) for tracks in result_lists), default=0)):
+            for tracks in result_lists:
+                if rank >= len(tracks):
+                    continue
+                track = tracks[rank]
+                title = normalize_title(track.title)
+                if not title:
+                    # nothing to compare on, so never treat it as a duplicate
+                    merged.append(track)
+                    continue
+                # the same recording on two sources differs by a second or two at most
+                key = (title, round(track.duration / 3000))
+                if key in seen:
+                    continue
+                seen.add(key)
+                merged.append(track)
+        return merged
+
+    async def load(self, query: str) -> LoadResult:
+        """Resolve a query to every track Lavalink returned, including whole playlists.
+
+        Tracks are shared with the cache and carry no requester; stamp them with
+        ``Track.with_requester`` before queueing.
+        """
+        key = self._normalize_query(query)
+        result = self.cache.get(key)
+        if result is not None:
+            return result
+        failure = self.failures.get(key)
+        if failure is not None:
+            raise commands.UserFeedbackCheckFailure(failure)
+        known = None if key.startswith(SEARCH_PREFIXES) else self.lookup(key)
+        return LoadResult([known]) if known else await self._fetch_shared(key)
+
+    async def close(self) -> None:
+        if self.disk is not None:
+            await self.disk.close()
+
+    async def _fetch_shared(self, query: str) -> LoadResult:
+        """Await the in-flight Lavalink call for ``query``, starting one if none exists."""
+        task = self._inflight.get(query)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(query))
+            self._inflight[query] = task
+            task.add_done_callback(lambda done: self._fetch_done(query, done))
+        else:
+            self.coalesced += 1
+        # shield so one waiter giving up does not cancel the request for everyone else
+        self._waiters[query] = self._waiters.get(query, 0) + 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[query] -= 1
+            if not self._waiters[query]:
+                del self._waiters[query]
+                if not task.done():
+                    # every caller has moved on (e.g. a newer keystroke), so stop the request;
+                    # unlist it first so a caller arriving before it finishes starts afresh
+                    if self._inflight.get(query) is task:
+                        del self._inflight[query]
+                    task.cancel()
+
+    def _fetch_done(self, query: str, task: asyncio.Task) -> None:
+        if self._inflight.get(query) is task:
+            del self._inflight[query]
+        if not task.cancelled():
+            # mark the exception as retrieved even if every waiter was cancelled
+            task.exception()
+
+    def _nodes(self) -> Sequence[Any]:
+        if self.node_provider is not None:
+            return self.node_provider()
         try:
             from redbot.cogs.audio import lavalink
         except ImportError:
             raise commands.UserFeedbackCheckFailure("Lavalink is unavailable.")
+        get_all_nodes = getattr(lavalink, "get_all_nodes", None)
+        if get_all_nodes is None:
+            return [lavalink.get_node()]
+        return get_all_nodes()
+
+    def _get_node(self) -> Any:
+        """Pick the node for the next search, passing over nodes whose breaker is open."""
+        nodes = self._nodes()
+        tripped = {name for name, breaker in self.breakers.items() if breaker.rejecting}
+        # with every node tripped, fall through so the breaker reports the outage
+        return self.balancer.pick(nodes, skip=tripped) or self.balancer.pick(nodes)
 
-        node = lavalink.get_node()
+    async def _fetch(self, query: str) -> LoadResult:
+        if self.disk is not None:
+            stored = await self.disk.get(query)
+            if stored is not None and stored.tracks:
+                self._remember(query, stored)
+                return stored
+        node = self._get_node()
         if node is None:
             raise commands.UserFeedbackCheckFailure("No Lavalink nodes are configured.")
-        results = await node.get_tracks(query)
-        tracks: List[Track] = []
-        for data in results.get("tracks", [])[:25]:
-            tracks.append(Track.from_lavalink(data, requester.id))
-        self.cache.set(query, tracks)
-        return tracks
-
-    async def autocomplete(self, interaction: discord.Interaction, current: str) -> List[app_commands.Choice[str]]:
-        if len(current) < 2:
-            return []
-        if not interaction.user or not getattr(interaction.user, "voice", None) or not interaction.user.voice.channel:
-            return []
-        if URL_RE.match(current):
-            return [app_commands.Choice(name=current[:100], value=current)]
-        prefix, query = self._parse_prefix(current)
-        search_query = f"{prefix}{query}"
+        breaker = self.breakers.setdefault(node_key(node), CircuitBreaker())
+        if not breaker.allow():
+            raise commands.UserFeedbackCheckFailure("Lavalink is not responding right now. Try again shortly.")
         try:
-            results = await self.search(search_query, interaction.user)  # type: ignore[arg-type]
+            with self.balancer.track(node):
+                results = await node.get_tracks(query)
         except Exception:
-            return []
-        choices: List[app_commands.Choice[str]] = []
-        for track in results[:25]:
-            title = track.title
-            duration = self._format_duration(track.duration)
-            name = f"{title} ({duration})"
-            choices.append(app_commands.Choice(name=name[:100], value=track.uri or track.title))
-        return choices
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # cancelled, e.g. the last autocomplete waiter left; must not leave a trial hanging
+            breaker.record_cancelled()
+            raise
+        breaker.record_success()
+        if results.get("loadType") in FAILED_LOAD_TYPES:
+            exception = results.get("exception") or results.get("data") or {}
+            message = exception.get("message") or "Lavalink could not load that query."
+            self.failures.set(query, message)
+            raise commands.UserFeedbackCheckFailure(message)
+        playlist_name = None
+        if results.get("loadType") in PLAYLIST_LOAD_TYPES:
+            playlist_name = results.get("playlistInfo", {}).get("name") or "Playlist"
+        tracks = [Track.from_lavalink(data, 0) for data in results.get("tracks", [])]
+        result = LoadResult(tracks, playlist_name)
+        self._remember(query, result)
+        if self.disk is not None and tracks:
+            self.disk.put(query, result)
+        return result
+
+    def _remember(self, query: str, result: LoadResult) -> None:
+        self.cache.set(query, result, ttl=None if result.tracks else self.negative_ttl)
+        for track in result.tracks[:25]:
+            self._index(track)
+
+    def lookup(self, uri_or_identifier: str) -> Optional[Track]:
+        """Return a previously resolved track for a URI or identifier without any network call."""
+        if not uri_or_identifier:
+            return None
+        return self.resolved.get(uri_or_identifier)
+
+    def _index(self, track: Track) -> None:
+        if not track.lavalink_track:
+            return
+        if track.uri:
+            self.resolved.set(track.uri, track)
+        identifier = _youtube_identifier(track.uri) if track.source == "youtube" else None
+        if identifier:
+            self.resolved.set(identifier, track)
+
+    def _normalize_query(self, query: str) -> str:
+        query = " ".join(query.split())
+        if URL_RE.match(query):
+            return query
+        # search terms are case-insensitive on every source, so fold them into one key
+        prefix, sep, terms = query.partition(":")
+        if sep and prefix.lower() in SEARCH_PREFIXES:
+            return f"{prefix.lower()}:{terms.strip().lower()}"
+        return query.lower()
 
     def _format_duration(self, duration_ms: int) -> str:
         seconds = duration_ms // 1000
@@ -0,0 +1,341 @@
+from __future__ import annotations
+
+import unicodedata
+from collections.abc import MutableSequence
+from itertools import chain, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union, overload
+
+from .models import Track
+
+def normalize_title(text: str) -> str:
+    """Case-folded letters, digits and marks of ``text`` in any script, words single-spaced."""
+    folded = unicodedata.normalize("NFKC", text).casefold()
+    # marks stay so scripts that spell vowels with them (Devanagari, Thai) keep their words whole
+    return " ".join("".join(ch if unicodedata.category(ch)[0] in "LNM" else " " for ch in folded).split())
+
+
+def _trigrams(text: str) -> Set[str]:
+    padded = f" {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class QueueIndex:
+    """Trigram index over queued track titles plus a requester index.
+
+    Entries are keyed by track object and reference counted, since the same
+    ``Track`` can sit in the queue more than once (queue loop). A lookup
+    intersects the posting sets of the query's trigrams, smallest first, and
+    only then checks the surviving titles, so its cost follows the number of
+    matches rather than the queue length.
+    """
+
+    def __init__(self) -> None:
+        self._entries: Dict[int, List] = {}  # id(track) -> [track, normalized title, count]
+        self._postings: Dict[str, Set[int]] = {}
+        self._requesters: Dict[int, Set[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, track: Track) -> None:
+        key = id(track)
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry[2] += 1
+            return
+        title = normalize_title(track.title)
+        self._entries[key] = [track, title, 1]
+        for gram in _trigrams(title):
+            self._postings.setdefault(gram, set()).add(key)
+        self._requesters.setdefault(track.requester_id, set()).add(key)
+
+    def discard(self, track: Track) -> None:
+        key = id(track)
+        entry = self._entries.get(key)
+        if entry is None:
+            return
+        entry[2] -= 1
+        if entry[2]:
+            return
+        del self._entries[key]
+        for gram in _trigrams(entry[1]):
+            posting = self._postings[gram]
+            posting.discard(key)
+            if not posting:
+                del self._postings[gram]
+        owned = self._requesters[track.requester_id]
+        owned.discard(key)
+        if not owned:
+            del self._requesters[track.requester_id]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._postings.clear()
+        self._requesters.clear()
+
+    def search(self, text: str = "", *, requester_id: Optional[int] = None, limit: int = 25) -> List[Track]:
+        """Up to ``limit`` tracks whose title contains ``text``, best matches first.
+
+        Exact titles rank first, then titles where ``text`` starts a word, then
+        any other substring match.
+        """
+        query = normalize_title(text)
+        if not query and (text.strip() or requester_id is None):
+            # punctuation alone carries nothing to match on; it must not match everything
+            return []
+        candidates: Optional[Set[int]] = None
+        if requester_id is not None:
+            candidates = self._requesters.get(requester_id, set())
+        if len(query) >= 3:
+            postings = []
+            # the padded edge grams would only match at word boundaries
+            for gram in _trigrams(query) - {f" {query[:2]}", f"{query[-2:]} "}:
+                posting = self._postings.get(gram)
+                if not posting:
+                    return []
+                postings.append(posting)
+            postings.sort(key=len)
+            if candidates is not None:
+                postings.insert(0, candidates)
+            candidates = postings[0].intersection(*postings[1:])
+        elif candidates is None:
+            # one or two characters carry too little to index; scan instead
+            candidates = set(self._entries)
+        ranks: Tuple[List[Track], List[Track], List[Track]] = ([], [], [])
+        word_start = f" {query}"
+        for key in candidates:
+            track, title, _ = self._entries[key]
+            if title == query:
+                ranks[0].append(track)
+                if len(ranks[0]) >= limit:
+                    break
+            elif title.startswith(query) or word_start in title:
+                ranks[1].append(track)
+            elif query in title:
+                ranks[2].append(track)
+        return list(islice(chain.from_iterable(ranks), limit))
+
+
+class TrackQueue(MutableSequence):
+    """Indexable track queue stored as bounded blocks indexed by a Fenwick tree.
+
+    Positional access, insert and delete locate their block in O(log n) and then
+    touch at most ``2 * block_size`` references, so editing the middle of a long
+    queue no longer copies the whole thing. ``append``/``popleft`` keep the deque
+    interface the player relies on.
+    """
+
+    def __init__(self, iterable: Iterable[Track] = (), *, block_size: int = 256, index: Optional[QueueIndex] = None):
+        self.block_size = block_size
+        self.index = index
+        self._blocks: List[List[Track]] = []
+        self._tree: List[int] = [0]
+        self._len = 0
+        self.extend(iterable)
+
+    # Fenwick tree over block lengths
+
+    def _rebuild(self) -> None:
+        count = len(self._blocks)
+        tree = [0] * (count + 1)
+        for i, block in enumerate(self._blocks, start=1):
+            tree[i] += len(block)
+            parent = i + (i & -i)
+            if parent <= count:
+                tree[parent] += tree[i]
+        self._tree = tree
+
+    def _update(self, block_index: int, delta: int) -> None:
+        i = block_index + 1
+        count = len(self._blocks)
+        while i <= count:
+            self._tree[i] += delta
+            i += i & -i
+
+    def _locate(self, index: int) -> Tuple[int, int]:
+        """Return (block, offset) for a non-negative index below ``len(self)``."""
+        pos = 0
+        remaining = index
+        step = 1 << (len(self._blocks).bit_length() - 1) if self._blocks else 0
+        while step:
+            nxt = pos + step
+            if nxt <= len(self._blocks) and self._tree[nxt] <= remaining:
+                pos = nxt
+                remaining -= self._tree[nxt]
+            step >>= 1
+        return pos, remaining
+
+    def _normalize(self, index: int) -> int:
+        if index < 0:
+            index += self._len
+        if index < 0 or index >= self._len:
+            raise IndexError("queue index out of range")
+        return index
+
+    # sequence protocol
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Track]:
+        return chain.from_iterable(self._blocks)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({list(self)!r})"
+
+    @overload
+    def __getitem__(self, index: int) -> Track: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Track]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Track, List[Track]]:
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._len)
+            if step != 1:
+                return list(self)[index]
+            return self.range(start, stop)
+        block, offset = self._locate(self._normalize(index))
+        return self._blocks[block][offset]
+
+    def __setitem__(self, index, value) -> None:  # type: ignore[override]
+        if isinstance(index, slice):
+            items = list(self)
+            items[index] = value
+            self._reset(items)
+            return
+        block, offset = self._locate(self._normalize(index))
+        if self.index is not None:
+            self.index.discard(self._blocks[block][offset])
+            self.index.add(value)
+        self._blocks[block][offset] = value
+
+    def __delitem__(self, index) -> None:  # type: ignore[override]
+        if isinstance(index, slice):
+            items = list(self)
+            del items[index]
+            self._reset(items)
+            return
+        self.pop(index)
+
+    def range(self, start: int, stop: int) -> List[Track]:
+        """Return the tracks in ``[start, stop)`` without materialising the whole queue."""
+        start = max(start, 0)
+        stop = min(stop, self._len)
+        if start >= stop:
+            return []
+        block, offset = self._locate(start)
+        items = chain(islice(self._blocks[block], offset, None), chain.from_iterable(self._blocks[block + 1 :]))
+        return list(islice(items, stop - start))
+
+    def insert(self, index: int, value: Track) -> None:
+        self._insert(index, value)
+        if self.index is not None:
+            self.index.add(value)
+
+    def append(self, value: Track) -> None:
+        self._append(value)
+        if self.index is not None:
+            self.index.add(value)
+
+    def appendleft(self, value: Track) -> None:
+        self.insert(0, value)
+
+    def extend(self, values: Iterable[Track]) -> None:
+        added = False
+        for value in values:
+            if not self._blocks or len(self._blocks[-1]) >= self.block_size:
+                self._blocks.append([])
+            self._blocks[-1].append(value)
+            self._len += 1
+            if self.index is not None:
+                self.index.add(value)
+            added = True
+        if added:
+            self._rebuild()
+
+    def pop(self, index: int = -1) -> Track:
+        block, offset = self._locate(self._normalize(index))
+        value = self._delete(block, offset)
+        if self.index is not None:
+            self.index.discard(value)
+        return value
+
+    def popleft(self) -> Track:
+        if not self._len:
+            raise IndexError("pop from an empty queue")
+        value = self._delete(0, 0)
+        if self.index is not None:
+            self.index.discard(value)
+        return value
+
+    def move(self, source: int, destination: int) -> None:
+        """Move the track at ``source`` so it ends up at ``destination``."""
+        # membership is unchanged, so the index is left alone
+        block, offset = self._locate(self._normalize(source))
+        self._insert(destination, self._delete(block, offset))
+
+    def positions(self, tracks: Iterable[Track]) -> Dict[int, int]:
+        """Map ``id(track)`` to the first queue index holding that track, in one pass."""
+        wanted = {id(track) for track in tracks}
+        found: Dict[int, int] = {}
+        for position, track in enumerate(self):
+            key = id(track)
+            if key in wanted and key not in found:
+                found[key] = position
+                if len(found) == len(wanted):
+                    break
+        return found
+
+    def clear(self) -> None:
+        self._reset([])
+
+    # block maintenance
+
+    def _insert(self, index: int, value: Track) -> None:
+        if index < 0:
+            index = max(index + self._len, 0)
+        if index >= self._len:
+            self._append(value)
+            return
+        block, offset = self._locate(index)
+        self._blocks[block].insert(offset, value)
+        self._len += 1
+        self._update(block, 1)
+        if len(self._blocks[block]) > 2 * self.block_size:
+            self._split(block)
+
+    def _append(self, value: Track) -> None:
+        if not self._blocks or len(self._blocks[-1]) >= self.block_size:
+            self._blocks.append([value])
+            self._len += 1
+            self._rebuild()
+            return
+        self._blocks[-1].append(value)
+        self._len += 1
+        self._update(len(self._blocks) - 1, 1)
+
+    def _delete(self, block: int, offset: int) -> Track:
+        value = self._blocks[block].pop(offset)
+        self._len -= 1
+        if self._blocks[block]:
+            self._update(block, -1)
+        else:
+            del self._blocks[block]
+            self._rebuild()
+        return value
+
+    def _split(self, block: int) -> None:
+        items = self._blocks[block]
+        half = len(items) // 2
+        self._blocks[block : block + 1] = [items[:half], items[half:]]
+        self._rebuild()
+
+    def _reset(self, items: List[Track]) -> None:
+        self._blocks = [items[i : i + self.block_size] for i in range(0, len(items), self.block_size)]
+        self._len = len(items)
+        self._rebuild()
+        if self.index is not None:
+            self.index.clear()
+            for value in items:
+                self.index.add(value)
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+
+from muse_music.models import Track, decode_lavalink_track
+from muse_music.player import GuildPlayer
+
+# Lavalink's documented example track (version 2, as sent by Lavalink 3.x)
+V2_BLOB = (
+    "QAAAjQIAJVJpY2sgQXN0bGV5IC0gTmV2ZXIgR29ubmEgR2l2ZSBZb3UgVXAADlJpY2tBc3RsZXlWRVZPAAAAAAADPCAAC2RRdzR3OVdnWGNR"
+    "AAEAK2h0dHBzOi8vd3d3LnlvdXR1YmUuY29tL3dhdGNoP3Y9ZFF3NHc5V2dYY1EAB3lvdXR1YmUAAAAAAAAAAA=="
+)
+# version 1: no version byte and no URI, here a live HTTP stream
+V1_BLOB = "AAAAOAALTG8tZmkgUmFkaW8ACENoaWxsaG9wAAAAAAAAAAAACGFiMTJjZDM0AQAEaHR0cAAAAAAAAAAA"
+# version 3 (Lavalink 4): artwork URL and ISRC follow the URI
+V3_BLOB = (
+    "QAAAtgMAD0JsaW5kaW5nIExpZ2h0cwAKVGhlIFdlZWtuZAAAAAAAAw1oABAwVmpJalc0R2xVWlVNRlY4AAEAL2h0dHBzOi8vb3Blbi5zcG90"
+    "aWZ5LmNvbS90cmFjay8wVmpJalc0R2xVWlVNRlY4AQAoaHR0cHM6Ly9pLnNjZG4uY28vaW1hZ2UvYWI2NzYxNmQwMDAwYjI3MwEADFVTVUcx"
+    "MTkwNDIwNgAHc3BvdGlmeQAAAAAAAAAA"
+)
+# Java's modified UTF-8: an encoded NUL and an emoji written as a CESU-8 surrogate pair
+MUTF8_BLOB = (
+    "QAAAZgIAEU51bMCAVGl0bGUg7aC87b61ABHDnG7Dr2NvZGUgw4RydGlzdAAAAAAAAAPoAAN4eXoAAQAaaHR0cHM6Ly9zb3VuZGNsb3VkLmNv"
+    "bS9hL2IACnNvdW5kY2xvdWQAAAAAAAAAAA=="
+)
+
+
+def test_decodes_version_1_track():
+    info = decode_lavalink_track(V1_BLOB)
+    assert info["title"] == "Lo-fi Radio"
+    assert info["author"] == "Chillhop"
+    assert info["isStream"] is True
+    assert info["uri"] is None
+    assert info["sourceName"] == "http"
+
+
+def test_decodes_version_2_track():
+    info = decode_lavalink_track(V2_BLOB)
+    assert info["title"] == "Rick Astley - Never Gonna Give You Up"
+    assert info["length"] == 212000
+    assert info["identifier"] == "dQw4w9WgXcQ"
+    assert info["uri"] == "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+    assert info["artworkUrl"] is None
+    assert info["sourceName"] == "youtube"
+
+
+def test_decodes_version_3_artwork_and_isrc():
+    info = decode_lavalink_track(V3_BLOB)
+    assert info["title"] == "Blinding Lights"
+    assert info["length"] == 200040
+    assert info["artworkUrl"] == "https://i.scdn.co/image/ab67616d0000b273"
+    assert info["isrc"] == "USUG11904206"
+    assert info["sourceName"] == "spotify"
+
+
+def test_decodes_modified_utf8():
+    info = decode_lavalink_track(MUTF8_BLOB)
+    assert info["title"] == "Nul\x00Title \U0001f3b5"
+    assert info["author"] == "Ünïcode Ärtist"
+
+
+def test_from_encoded_builds_a_playable_track():
+    track = Track.from_encoded(V2_BLOB, requester_id=7)
+    assert track.title == "Rick Astley - Never Gonna Give You Up"
+    assert track.duration == 212000
+    assert track.requester_id == 7
+    assert track.lavalink_track == V2_BLOB
+    assert track.thumbnail == "https://img.youtube.com/vi/dQw4w9WgXcQ/hqdefault.jpg"
+
+
+@pytest.mark.parametrize("blob", ["not base64!", V2_BLOB[:40]])
+def test_malformed_blob_raises_value_error(blob):
+    with pytest.raises(ValueError):
+        decode_lavalink_track(blob)
+
+
+class FakeConfig:
+    """Just enough of Red's Config for ``GuildPlayer.load``."""
+
+    def __init__(self, settings):
+        self.settings = settings
+
+    def guild_from_id(self, guild_id):
+        return self
+
+    async def all(self):
+        return self.settings
+
+
+def test_load_skips_stored_tracks_that_no_longer_decode():
+    config = FakeConfig({"queue": [{"lavalink_track": "garbage"}, {"lavalink_track": V2_BLOB}]})
+    player = GuildPlayer(None, 1, config)
+    asyncio.run(player.load())
+    assert [track.title for track in player.queue] == ["Rick Astley - Never Gonna Give You Up"]
@@ -0,0 +1,105 @@
+import asyncio
+from types import SimpleNamespace
+
+from muse_music.services.nodes import SearchBalancer, node_key, node_load
+from muse_music.services.resolver import CircuitBreaker, ResolverService
+
+
+class FakeNode:
+    """Stands in for a Lavalink node: answers searches after ``delay`` seconds."""
+
+    def __init__(self, name, *, ready=True, fail=False, delay=0.01, stats=None):
+        self.name = name
+        self.ready = ready
+        self.fail = fail
+        self.delay = delay
+        self.stats = stats
+        self.queries = []
+
+    async def get_tracks(self, query):
+        self.queries.append(query)
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        info = {"title": query, "uri": f"https://example.com/{query}", "length": 1000, "sourceName": "http"}
+        return {"loadType": "SEARCH_RESULT", "tracks": [{"track": "QAAA", "info": info}]}
+
+
+def stats(players=0, playing=0, load=0.0, deficit=0, nulled=0):
+    return SimpleNamespace(
+        players=players, playing_players=playing, system_load=load, frames_deficit=deficit, frames_nulled=nulled
+    )
+
+
+def test_node_load_penalises_busy_and_struggling_nodes():
+    idle = FakeNode("idle", stats=stats())
+    busy = FakeNode("busy", stats=stats(players=20, playing=15))
+    lagging = FakeNode("lagging", stats=stats(players=2, playing=2, deficit=1500))
+    assert node_load(idle) < node_load(busy) < node_load(lagging)
+
+
+def test_node_load_ignores_missing_frame_samples():
+    assert node_load(FakeNode("fresh", stats=stats(deficit=-1, nulled=-1))) == 0
+
+
+def test_node_key_falls_back_to_address():
+    assert node_key(SimpleNamespace(host="10.0.0.2", port=2333)) == "10.0.0.2:2333"
+
+
+def test_balancer_skips_nodes_that_are_not_ready():
+    balancer = SearchBalancer()
+    nodes = [FakeNode("down", ready=False), FakeNode("up")]
+    assert {balancer.pick(nodes).name for _ in range(10)} == {"up"}
+    assert balancer.pick([FakeNode("down", ready=False)]) is None
+
+
+def test_balancer_prefers_node_with_fewer_searches_in_flight():
+    balancer = SearchBalancer()
+    a, b = FakeNode("a"), FakeNode("b")
+    with balancer.track(a):
+        assert balancer.pick([a, b]) is b
+    assert balancer.in_flight == {}
+
+
+def test_resolver_spreads_concurrent_searches_across_nodes():
+    nodes = [FakeNode("a"), FakeNode("b"), FakeNode("c")]
+    resolver = ResolverService(node_provider=lambda: nodes)
+
+    async def run():
+        await asyncio.gather(*(resolver.load(f"ytsearch:song {i}") for i in range(30)))
+
+    asyncio.run(run())
+    assert [len(node.queries) for node in nodes] == [10, 10, 10]
+
+
+def test_resolver_routes_around_a_failing_node():
+    bad, good = FakeNode("bad", fail=True), FakeNode("good")
+    resolver = ResolverService(node_provider=lambda: [bad, good])
+
+    async def run():
+        for i in range(20):
+            try:
+                await resolver.load(f"ytsearch:song {i}")
+            except RuntimeError:
+                pass
+
+    asyncio.run(run())
+    # once its breaker opens the failing node stops receiving searches
+    assert len(bad.queries) == resolver.breakers["bad"].threshold
+    assert len(good.queries) == 20 - len(bad.queries)
+
+
+def test_cancelled_trial_frees_the_breaker():
+    node = FakeNode("slow", delay=1.0)
+    resolver = ResolverService(node_provider=lambda: [node])
+    breaker = resolver.breakers["slow"] = CircuitBreaker(threshold=1, cooldown=0)
+    breaker.record_failure()
+
+    async def run():
+        task = asyncio.ensure_future(resolver.load("ytsearch:anything"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+    assert breaker.allow()